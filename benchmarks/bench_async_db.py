@@ -0,0 +1,104 @@
+"""
+Concurrent throughput of the sync Session versus the AsyncSession.
+
+Every "request" runs one contacts query, the way the handlers in main.py do. A database
+round trip is simulated with an extra sleeping statement (a registered ``sleep`` function on SQLite,
+``pg_sleep`` on Postgres), so the effect of blocking the event loop is visible on a local file database too.
+
+    python benchmarks/bench_async_db.py --url sqlite:///./bench.db --requests 200 --concurrency 20 --latency-ms 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import get_async_url  # noqa: E402
+from src.database.models import Base, Contact  # noqa: E402
+
+
+def _sqlite_sleep(ms):
+    time.sleep(ms / 1000)
+    return ms
+
+
+def _register_sleep(engine):
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def connect(dbapi_connection, connection_record):
+            dbapi_connection.create_function("sleep", 1, _sqlite_sleep)
+
+
+def _round_trip(dialect: str, latency_ms: int):
+    return select(func.pg_sleep(latency_ms / 1000) if dialect == "postgresql" else func.sleep(latency_ms))
+
+
+QUERY = select(Contact).filter(Contact.user_id == 1)
+
+
+async def run_sync(url: str, requests: int, concurrency: int, latency_ms: int) -> float:
+    engine = create_engine(url, pool_size=concurrency)
+    _register_sleep(engine)
+    session_local = sessionmaker(bind=engine)
+    round_trip = _round_trip(engine.dialect.name, latency_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            with session_local() as db:
+                db.execute(round_trip)
+                db.execute(QUERY).scalars().all()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return requests / elapsed
+
+
+async def run_async(url: str, requests: int, concurrency: int, latency_ms: int) -> float:
+    engine = create_async_engine(get_async_url(url), pool_size=concurrency)
+    _register_sleep(engine.sync_engine)
+    session_local = async_sessionmaker(engine)
+    round_trip = _round_trip(engine.dialect.name, latency_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            async with session_local() as db:
+                await db.execute(round_trip)
+                (await db.execute(QUERY)).scalars().all()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///./bench_async_db.db")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(create_engine(args.url))
+    sync_rps = asyncio.run(run_sync(args.url, args.requests, args.concurrency, args.latency_ms))
+    async_rps = asyncio.run(run_async(args.url, args.requests, args.concurrency, args.latency_ms))
+    print(json.dumps({
+        "url": args.url, "requests": args.requests, "concurrency": args.concurrency, "latency_ms": args.latency_ms,
+        "sync_rps": round(sync_rps, 1), "async_rps": round(async_rps, 1), "speedup": round(async_rps / sync_rps, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
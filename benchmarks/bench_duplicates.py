@@ -0,0 +1,98 @@
+"""
+Time to find the duplicate contacts of one user, with the precision and recall on planted duplicates.
+
+    python benchmarks/bench_duplicates.py --contacts 100000 --duplicates 0.1
+
+Every planted duplicate copies a contact with a typo in the first name, swapped first and last name,
+a reformatted phone or an uppercased email, so only the blocking keys can bring the pair together.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import make_async_engine  # noqa: E402
+from src.database.models import Base, Contact, User  # noqa: E402
+from src.duplicates import find_duplicates  # noqa: E402
+from src.normalize import normalized_columns  # noqa: E402
+
+FIRST = ["Anna", "Olena", "John", "Maria", "Ivan", "Petro", "Sofia", "Andrii", "Kateryna", "Michael", "Robert", "Iryna"]
+LAST = ["Smith", "Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Johnson", "Brown", "Melnyk", "Boyko", "Lee"]
+
+
+def person(i: int, rng: random.Random) -> dict:
+    return {"firstname": f"{rng.choice(FIRST)}{i}", "lastname": rng.choice(LAST), "email": f"contact{i}@example.com",
+            "phone": f"+38050{i:07d}", "birthdate": date(1990, 1 + i % 12, 1 + i % 28), "otherinform": "", "user_id": 1}
+
+
+def variant(contact: dict, i: int, rng: random.Random) -> dict:
+    copy = dict(contact)
+    kind = i % 4
+    if kind == 0:
+        name = copy["firstname"]
+        position = rng.randrange(1, len(name))
+        copy["firstname"] = name[:position] + name[position + 1:]
+        copy["email"] = f"other{i}@example.com"
+    elif kind == 1:
+        copy["firstname"], copy["lastname"] = copy["lastname"], copy["firstname"]
+        copy["email"] = None
+    elif kind == 2:
+        digits = copy["phone"][3:]
+        copy["phone"] = f"({digits[:3]}) {digits[3:6]}-{digits[6:8]}-{digits[8:]}"
+        copy["email"] = f"other{i}@example.com"
+    else:
+        copy["email"] = copy["email"].upper()
+        copy["phone"] = None
+    return copy
+
+
+async def run(contacts: int, duplicates: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    originals = [person(i, rng) for i in range(contacts)]
+    planted = rng.sample(range(contacts), int(contacts * duplicates))
+    rows = originals + [variant(originals[i], n, rng) for n, i in enumerate(planted)]
+    expected = {(i + 1, contacts + n + 1) for n, i in enumerate(planted)}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_async_engine(f"sqlite:///{tmp}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine) as db, db.begin():
+            await db.execute(insert(User), [{"id": 1, "email": "bench@example.com", "password": "x"}])
+            await db.execute(insert(Contact), [normalized_columns(row) for row in rows])
+        async with AsyncSession(engine) as db:
+            start = time.perf_counter()
+            groups = await find_duplicates(1, db, limit=len(rows))
+            elapsed = time.perf_counter() - start
+        await engine.dispose()
+    found = {tuple(pair["ids"]) for group in groups for pair in group["pairs"]}
+    return {
+        "contacts": len(rows),
+        "planted": len(expected),
+        "ms": round(elapsed * 1000, 1),
+        "groups": len(groups),
+        "precision": round(len(found & expected) / len(found), 3) if found else None,
+        "recall": round(len(found & expected) / len(expected), 3) if expected else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of contacts that get a duplicate")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.contacts, args.duplicates, args.seed)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
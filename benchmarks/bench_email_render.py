@@ -0,0 +1,48 @@
+"""
+Rate of rendering confirmation letters, batched against the way fastapi-mail renders them.
+
+    python benchmarks/bench_email_render.py --recipients 10000
+
+cached:   render_confirmations, one compiled template for the whole batch
+uncached: what fastapi-mail does for every send_message, a new environment that loads the template file again
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth_services import auth_service  # noqa: E402
+from src.email import get_conf, render_confirmations  # noqa: E402
+
+
+def uncached(recipients: list[str], host: str) -> list[str]:
+    return [get_conf().template_engine().get_template("email_template.html").render(
+        host=host, email=email, token=auth_service.create_email_token({"sub": email})) for email in recipients]
+
+
+def run(recipients: int, sample: int) -> dict:
+    emails = [f"user{i}@example.com" for i in range(recipients)]
+    result = {}
+    for name, render, batch in (("cached", render_confirmations, emails), ("uncached", uncached, emails[:sample])):
+        start = time.perf_counter()
+        bodies = render(batch, "http://host/")
+        elapsed = time.perf_counter() - start
+        assert len(bodies) == len(batch)
+        result[name] = {"letters": len(batch), "per_second": round(len(batch) / elapsed)}
+    result["speedup"] = round(result["cached"]["per_second"] / result["uncached"]["per_second"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipients", type=int, default=10_000)
+    parser.add_argument("--sample", type=int, default=500, help="letters rendered the uncached way")
+    args = parser.parse_args()
+    print(json.dumps(run(args.recipients, args.sample), indent=2))
+
+
+if __name__ == "__main__":
+    main()
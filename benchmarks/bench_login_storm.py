@@ -0,0 +1,81 @@
+"""
+Latency of an unrelated endpoint while a burst of logins verifies bcrypt passwords.
+
+    python benchmarks/bench_login_storm.py --logins 50 --pings 200
+
+Runs the same burst twice against a small in-process app: once verifying on the event loop
+(the old Auth.verify_password) and once through the PasswordHasher pool, and reports ping p50/p99.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth_services import auth_service  # noqa: E402
+
+app = FastAPI()
+HASHED = auth_service.pwd_context.hash("secret")
+
+
+@app.post("/login/inline")
+async def login_inline():
+    return {"ok": auth_service.pwd_context.verify("secret", HASHED)}
+
+
+@app.post("/login/pool")
+async def login_pool():
+    return {"ok": await auth_service.verify_password("secret", HASHED)}
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+async def storm(client: httpx.AsyncClient, mode: str, logins: int, pings: int) -> dict:
+    latencies = []
+
+    async def pinger():
+        # latency is measured from the scheduled send time, so time spent waiting for a blocked loop counts
+        for i in range(pings):
+            scheduled = start + i * interval
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await client.get("/ping")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+
+    interval = 0.01
+    start = time.perf_counter()
+    await asyncio.gather(pinger(), *(client.post(f"/login/{mode}") for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {"ping_p50_ms": round(statistics.median(latencies), 2), "ping_p99_ms": round(quantiles[98], 2),
+            "logins_per_second": round(logins / elapsed, 1)}
+
+
+async def run(logins: int, pings: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        result = {mode: await storm(client, mode, logins, pings) for mode in ("inline", "pool")}
+    result["pool"]["hasher"] = auth_service.hasher.metrics()
+    auth_service.hasher.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--pings", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.logins, args.pings)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Per request overhead of the rate limit dependency.
+
+    python benchmarks/bench_rate_limit.py --requests 2000
+
+Serves the same endpoint without a limit, with RateLimit (local counting, background Redis sync)
+and with a limiter that does INCR + EXPIRE on Redis for every request, like fastapi-limiter did.
+Redis is fakeredis, so the last row understates a real network round trip.
+Also reports the cost of a bare SlidingWindowLimiter.hit call.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+
+import fakeredis.aioredis as fakeredis
+import httpx
+from fastapi import Depends, FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth_services import auth_service  # noqa: E402
+from src.database.models import User  # noqa: E402
+from src.rate_limit import RateLimit, SlidingWindowLimiter  # noqa: E402
+
+redis = fakeredis.FakeRedis()
+limiter = SlidingWindowLimiter(redis)
+USER = User(id=1, email="bench@example.com", confirmed=True)
+TIMES = 10 ** 9
+
+
+async def redis_per_request(current_user: User = Depends(auth_service.get_current_user)):
+    key = f"bench:{current_user.id}:{int(time.time() // 60)}"
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.incr(key)
+        pipe.expire(key, 60)
+        count, _ = await pipe.execute()
+    assert count <= TIMES
+
+
+app = FastAPI()
+app.dependency_overrides[auth_service.get_current_user] = lambda: USER
+
+
+@app.get("/none")
+async def no_limit(current_user: User = Depends(auth_service.get_current_user)):
+    return {"ok": True}
+
+
+@app.get("/local", dependencies=[Depends(RateLimit("bench", TIMES, 60, limiter=limiter))])
+async def local_limit(current_user: User = Depends(auth_service.get_current_user)):
+    return {"ok": True}
+
+
+@app.get("/redis", dependencies=[Depends(redis_per_request)])
+async def redis_limit(current_user: User = Depends(auth_service.get_current_user)):
+    return {"ok": True}
+
+
+async def run(requests: int) -> dict:
+    result = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/none", "/local", "/redis"):
+            for _ in range(50):
+                await client.get(path)
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                await client.get(path)
+                latencies.append((time.perf_counter() - start) * 1e6)
+            result[path] = {"mean_us": round(statistics.fmean(latencies), 1),
+                            "p50_us": round(statistics.median(latencies), 1)}
+    await limiter.close()
+    for path in ("/local", "/redis"):
+        result[path]["overhead_us"] = round(result[path]["mean_us"] - result["/none"]["mean_us"], 1)
+    bare = SlidingWindowLimiter()
+    number = 200_000
+    result["hit_ns"] = round(timeit.timeit(lambda: bare.hit("k", TIMES, 60), number=number) / number * 1e9)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Latency of the ranked contact search in src/search.py.
+
+    python benchmarks/bench_search.py --url sqlite:///./bench_search.db --users 1000 --contacts 1000
+
+Seeds users x contacts generated names into a scratch database (once, reused on later runs)
+and times prefix, substring and typo queries of random users through search_contacts.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import get_async_url  # noqa: E402
+from src.database.models import Base, Contact, User  # noqa: E402
+from src.search import search_contacts  # noqa: E402
+
+SYLLABLES = ["an", "na", "mi", "cha", "el", "jo", "hn", "ka", "re", "ni", "ol", "ga", "ser", "hii", "vik", "tor",
+             "ma", "ria", "ole", "ksa", "dr", "dmy", "tro", "yu", "lia", "pe", "tr", "ivan", "ko", "val"]
+
+
+def make_name(rnd: random.Random) -> str:
+    return "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+
+
+def seed(url: str, users: int, contacts: int, chunk: int = 10000) -> None:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if conn.execute(select(func.count(User.id))).scalar() >= users:
+            return
+    rnd = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": u, "email": f"user{u}@example.com", "password": "x"} for u in range(1, users + 1)
+        ])
+    rows = []
+    for u in range(1, users + 1):
+        for c in range(contacts):
+            first, last = make_name(rnd), make_name(rnd)
+            rows.append({"firstname": first, "lastname": last, "email": f"{first}.{last}{c}@example.com".lower(),
+                         "phone": f"+380{rnd.randint(500000000, 999999999)}", "otherinform": "",
+                         "birth": date(1960, 1, 1) + timedelta(days=rnd.randint(0, 20000)), "user_id": u})
+            if len(rows) >= chunk:
+                with engine.begin() as conn:
+                    conn.execute(Contact.__table__.insert(), rows)
+                rows = []
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(Contact.__table__.insert(), rows)
+    engine.dispose()
+
+
+def typo(word: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+async def run(url: str, users: int, queries: int) -> dict:
+    engine = create_async_engine(get_async_url(url))
+    session_local = async_sessionmaker(engine, expire_on_commit=False)
+    rnd = random.Random(2)
+    timings = {"prefix": [], "substring": [], "typo": []}
+    async with session_local() as db:
+        for _ in range(queries):
+            user_id = rnd.randint(1, users)
+            contact = (await db.execute(select(Contact).filter(Contact.user_id == user_id).limit(1)
+                                        .offset(rnd.randint(0, 50)))).scalar()
+            word = contact.lastname.lower()
+            for kind, q in (("prefix", word[:4]), ("substring", word[1:5]), ("typo", typo(word, rnd))):
+                start = time.perf_counter()
+                await search_contacts(user_id, q, db)
+                timings[kind].append((time.perf_counter() - start) * 1000)
+    await engine.dispose()
+    return {kind: {"p50_ms": round(statistics.median(values), 2),
+                   "p95_ms": round(statistics.quantiles(values, n=100)[94], 2),
+                   "p99_ms": round(statistics.quantiles(values, n=100)[98], 2)}
+            for kind, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///./bench_search.db")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--contacts", type=int, default=1000, help="contacts per user")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    seed(args.url, args.users, args.contacts)
+    result = asyncio.run(run(args.url, args.users, args.queries))
+    print(json.dumps({"url": args.url, "contacts": args.users * args.contacts, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
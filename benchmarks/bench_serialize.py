@@ -0,0 +1,87 @@
+"""
+Time to load and serialize a list of contacts, before and after the column rows + orjson path.
+
+    python benchmarks/bench_serialize.py --contacts 10000
+
+before:  ORM entities validated and dumped by FastAPI's response_model=list[ContactResponse], JSONResponse
+adapter: ORM entities through the cached contact_list_adapter (validate + dump_json)
+after:   the CONTACT_COLUMNS rows get_contacts_page reads, dumped by orjson
+Most of the validation cost is EmailStr checking every address again on the way out.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.contacts import CONTACT_COLUMNS  # noqa: E402
+from src.database.db import make_async_engine  # noqa: E402
+from src.database.models import Base, Contact, User  # noqa: E402
+from src.schemas import ContactResponse, contact_list_adapter  # noqa: E402
+
+FIELD = create_response_field(name="contacts", type_=list[ContactResponse])
+
+
+async def before(db: AsyncSession) -> bytes:
+    contacts = (await db.execute(select(Contact).filter(Contact.user_id == 1))).scalars().all()
+    return JSONResponse(await serialize_response(field=FIELD, response_content=contacts)).body
+
+
+async def adapter(db: AsyncSession) -> bytes:
+    contacts = (await db.execute(select(Contact).filter(Contact.user_id == 1))).scalars().all()
+    return contact_list_adapter.dump_json(contact_list_adapter.validate_python(contacts, from_attributes=True))
+
+
+async def after(db: AsyncSession) -> bytes:
+    rows = (await db.execute(select(*CONTACT_COLUMNS).filter(Contact.user_id == 1))).all()
+    return orjson.dumps([row._asdict() for row in rows])
+
+
+async def run(contacts: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_async_engine(f"sqlite:///{tmp}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine) as db, db.begin():
+            await db.execute(insert(User), [{"id": 1, "email": "bench@example.com", "password": "x"}])
+            await db.execute(insert(Contact), [
+                {"firstname": f"First{i}", "lastname": f"Last{i}", "email": f"contact{i}@example.com",
+                 "phone": f"+38050{i:07d}", "birthdate": date(1990, 1 + i % 12, 1 + i % 28),
+                 "otherinform": "note", "user_id": 1} for i in range(contacts)])
+        result = {}
+        for name, variant in (("before", before), ("adapter", adapter), ("after", after)):
+            best = float("inf")
+            for _ in range(repeat):
+                async with AsyncSession(engine) as db:
+                    start = time.perf_counter()
+                    body = await variant(db)
+                    best = min(best, time.perf_counter() - start)
+            assert len(json.loads(body)) == contacts
+            result[name] = {"ms": round(best * 1000, 1), "bytes": len(body)}
+        await engine.dispose()
+    result["speedup"] = round(result["before"]["ms"] / result["after"]["ms"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--contacts", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.contacts, args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Load test of the contacts API: seeded users drive the real app in main.py with concurrent async clients.
+
+    python benchmarks/load_test.py --users 20 --contacts 500 --clients 20 --duration 30 --output load.json
+
+The database at --url (a scratch SQLite file by default, Postgres works too) is recreated and seeded with
+users x contacts, all users confirmed with the same password. Every client logs in as one of the users and
+runs a weighted mix of list (polling with If-None-Match), get, search, birthdays, create/update/delete,
+bulk import and signup until --duration is over. The mix is seeded, so runs are comparable.
+
+By default the app runs in process through httpx's ASGITransport with its own lifespan, Redis is fakeredis
+and the signup letters go through the email worker to a local aiosmtpd sink, so nothing leaves the machine.
+With --base-url the clients hit a running server instead; start it on the same --url after seeding with
+--seed-only.
+
+The report is JSON: requests, errors, RPS and p50/p95/p99/max latency per route and in total, with the
+commit and the settings of the run, so results can be diffed across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_search import SYLLABLES, make_name  # noqa: E402
+
+PASSWORD = "load-test"
+# relative weights of the flows a client picks from
+FLOWS = {"list": 30, "get": 15, "search": 15, "birthdays": 10, "write": 15, "bulk": 3, "signup": 2}
+
+
+def configure(args, smtp_port: int) -> None:
+    """
+    Point the settings at the benchmark database and the local SMTP sink. Must run before the settings
+    are first used: get_settings reads the environment once and caches it.
+    """
+    os.environ.update({
+        "SQLALCHEMY_DATABASE_URL": args.url,
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(smtp_port),
+        "RATE_LIMIT_ENABLED": str(args.rate_limits).lower(),
+        "AVATAR_STORAGE": "local",
+    })
+    for key, value in {"SECRET_KEY": "load-test", "ALGORITHM": "HS256", "MAIL_USERNAME": "", "MAIL_PASSWORD": "",
+                       "MAIL_FROM": "noreply@example.com", "ORIGINS_URL": "http://localhost",
+                       "CLOUDINARY_NAME": "offline", "CLOUDINARY_API_KEY": "offline",
+                       "CLOUDINARY_API_SECRET": "offline"}.items():
+        os.environ.setdefault(key, value)
+
+
+def seed(url: str, users: int, contacts: int, chunk: int = 10000) -> None:
+    from sqlalchemy import insert
+
+    from src.auth_services import auth_service
+    from src.database.db import make_engine
+    from src.database.models import Base, Contact, User
+    from src.normalize import normalized_columns
+
+    engine = make_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    password = auth_service.pwd_context.hash(PASSWORD)
+    rnd = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": u, "email": f"load{u}@example.com", "password": password,
+                                     "confirmed": True} for u in range(1, users + 1)])
+    rows = []
+    for u in range(1, users + 1):
+        for c in range(contacts):
+            first, last = make_name(rnd), make_name(rnd)
+            rows.append(normalized_columns({"firstname": first, "lastname": last, "email": f"{first}.{last}{c}@example.com".lower(),
+                         "phone": f"+380{rnd.randint(500000000, 999999999)}", "otherinform": "",
+                         "birth": date(1960, 1, 1) + timedelta(days=rnd.randint(0, 20000)), "user_id": u}))
+            if len(rows) >= chunk:
+                with engine.begin() as conn:
+                    conn.execute(Contact.__table__.insert(), rows)
+                rows = []
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(Contact.__table__.insert(), rows)
+    engine.dispose()
+
+
+class Stats:
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, route: str, status: int, seconds: float) -> None:
+        self.latencies[route].append(seconds * 1000)
+        self.statuses[route][status] += 1
+
+    @staticmethod
+    def summary(latencies: list[float], statuses: Counter, elapsed: float) -> dict:
+        quantiles = (statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1
+                     else latencies * 99)
+        return {"requests": len(latencies), "errors": sum(n for status, n in statuses.items() if status >= 400),
+                "rps": round(len(latencies) / elapsed, 1), "p50_ms": round(quantiles[49], 2),
+                "p95_ms": round(quantiles[94], 2), "p99_ms": round(quantiles[98], 2),
+                "max_ms": round(max(latencies), 2), "statuses": {str(s): n for s, n in sorted(statuses.items())}}
+
+    def report(self, elapsed: float) -> dict:
+        routes = {route: self.summary(self.latencies[route], self.statuses[route], elapsed)
+                  for route in sorted(self.latencies)}
+        total = self.summary([ms for values in self.latencies.values() for ms in values],
+                             sum(self.statuses.values(), Counter()), elapsed)
+        return {"total": total, "routes": routes}
+
+
+class VirtualClient:
+    """
+    One logged in user running random flows against the API.
+    """
+
+    def __init__(self, number: int, http: httpx.AsyncClient, stats: Stats, user: int):
+        self.number = number
+        self.http = http
+        self.stats = stats
+        self.user = user
+        self.rnd = random.Random(number)
+        self.headers = {}
+        self.etag = None
+        self.ids = []
+        self.created = 0
+
+    async def call(self, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        headers = {**self.headers, **kwargs.pop("headers", {})}
+        start = time.perf_counter()
+        response = await self.http.request(method, url, headers=headers, **kwargs)
+        self.stats.record(route, response.status_code, time.perf_counter() - start)
+        return response
+
+    def contact(self) -> dict:
+        self.created += 1
+        first, last = make_name(self.rnd), make_name(self.rnd)
+        return {"firstname": first, "lastname": last, "phone": f"+380{self.rnd.randint(500000000, 999999999)}",
+                "email": f"c{self.number}.{self.created}.{self.rnd.randrange(10 ** 9)}@load.example.com",
+                "birthdate": str(date(1960, 1, 1) + timedelta(days=self.rnd.randint(0, 20000))), "otherinform": ""}
+
+    async def login(self) -> None:
+        response = await self.call("POST /api/auth/login", "POST", "/api/auth/login",
+                                   data={"username": f"load{self.user}@example.com", "password": PASSWORD})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await self.call("GET /contacts", "GET", "/contacts", params={"limit": 100})
+        self.ids = [contact["id"] for contact in response.json()]
+
+    async def flow_list(self) -> None:
+        headers = {"If-None-Match": self.etag} if self.etag and self.rnd.random() < 0.5 else {}
+        response = await self.call("GET /contacts", "GET", "/contacts", headers=headers)
+        self.etag = response.headers.get("etag", self.etag)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor and self.rnd.random() < 0.3:
+            await self.call("GET /contacts", "GET", "/contacts", params={"cursor": cursor})
+
+    async def flow_get(self) -> None:
+        if self.ids:
+            await self.call("GET /contacts/{id}", "GET", f"/contacts/{self.rnd.choice(self.ids)}")
+
+    async def flow_search(self) -> None:
+        q = self.rnd.choice(SYLLABLES) + self.rnd.choice(SYLLABLES)
+        await self.call("GET /contacts/search", "GET", "/contacts/search", params={"q": q})
+
+    async def flow_birthdays(self) -> None:
+        await self.call("GET /contacts/birthdays", "GET", "/contacts/birthdays",
+                        params={"days": self.rnd.choice((7, 30))})
+
+    async def flow_write(self) -> None:
+        response = await self.call("POST /contacts", "POST", "/contacts", json=self.contact())
+        if response.status_code >= 400:
+            return
+        contact_id = response.json()["id"]
+        await self.call("PATCH /contacts/{id}", "PATCH", f"/contacts/{contact_id}", json=self.contact())
+        await self.call("DELETE /contacts/{id}", "DELETE", f"/contacts/{contact_id}")
+
+    async def flow_bulk(self) -> None:
+        body = "".join(json.dumps(self.contact()) + "\n" for _ in range(100))
+        await self.call("POST /contacts/bulk", "POST", "/contacts/bulk", content=body,
+                        headers={"Content-Type": "application/x-ndjson"})
+
+    async def flow_signup(self) -> None:
+        email = f"signup{self.number}.{self.rnd.randrange(10 ** 9)}@load.example.com"
+        await self.call("POST /api/auth/signup", "POST", "/api/auth/signup",
+                        json={"email": email, "password": PASSWORD})
+
+    async def run(self, deadline: float) -> None:
+        await self.login()
+        names, weights = zip(*FLOWS.items())
+        while time.monotonic() < deadline:
+            await getattr(self, f"flow_{self.rnd.choices(names, weights)[0]}")()
+
+
+class SMTPSink:
+    """
+    Local SMTP server that accepts and counts every letter.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.controller = None
+        self.port = 0
+
+    def start(self) -> bool:
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            return False
+        import socket
+
+        sink = self
+
+        class Handler:
+            async def handle_DATA(self, server, session, envelope):
+                sink.received += 1
+                return "250 OK"
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.controller = Controller(Handler(), hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+        return True
+
+    def stop(self) -> None:
+        if self.controller is not None:
+            self.controller.stop()
+
+
+def use_fakeredis() -> None:
+    """
+    Open the shared Redis pool on an in-memory fakeredis server; the app lifespan then reuses it.
+    """
+    import redis.asyncio as redis
+    from fakeredis import FakeServer
+    from fakeredis.aioredis import FakeConnection
+
+    from src.metrics import InstrumentedRedis
+    from src.redis_pool import redis_pool
+
+    redis_pool.pool = redis.ConnectionPool(connection_class=FakeConnection, server=FakeServer())
+    redis_pool.client = InstrumentedRedis(connection_pool=redis_pool.pool)
+
+
+async def drive(http: httpx.AsyncClient, args) -> tuple[Stats, float]:
+    stats = Stats()
+    clients = [VirtualClient(i, http, stats, user=i % args.users + 1) for i in range(args.clients)]
+    start = time.monotonic()
+    await asyncio.gather(*(client.run(start + args.duration) for client in clients))
+    return stats, time.monotonic() - start
+
+
+async def run(args, sink: SMTPSink) -> dict:
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as http:
+            stats, elapsed = await drive(http, args)
+        return {**stats.report(elapsed), "elapsed_s": round(elapsed, 2)}
+
+    import main
+    from src.conf.config import settings
+    from src.email import build_message, email_queue, get_conf
+    from src.email_worker import EmailWorker, SMTPPool
+
+    use_fakeredis()
+    async with main.lifespan(main.app):
+        stop = asyncio.Event()
+        worker = None
+        if sink.controller is not None:
+            config = get_conf().model_copy(update={"MAIL_SSL_TLS": False, "USE_CREDENTIALS": False,
+                                                   "VALIDATE_CERTS": False})
+            worker = EmailWorker(email_queue, SMTPPool(config, settings.email_smtp_pool_size), build_message,
+                                 settings.email_batch_size, poll_timeout=0.2)
+            worker_task = asyncio.create_task(worker.run(stop))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60) as http:
+            stats, elapsed = await drive(http, args)
+        if worker is not None:
+            # let the worker drain the queue before the sink is stopped
+            for _ in range(50):
+                if not await email_queue.redis.llen(email_queue.QUEUE):
+                    break
+                await asyncio.sleep(0.1)
+            stop.set()
+            await worker_task
+    emails = None if worker is None else {"sent": worker.sent, "failed": worker.failed, "received": sink.received}
+    return {**stats.report(elapsed), "elapsed_s": round(elapsed, 2), "emails": emails}
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="database url, a scratch SQLite file by default")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--contacts", type=int, default=500, help="contacts per user")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--base-url", help="load a running server instead of the app in process")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the route rate limits on")
+    parser.add_argument("--seed-only", action="store_true")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.url = args.url or f"sqlite:///{tmp}/load_test.db"
+        sink = SMTPSink()
+        if not args.base_url:
+            sink.start()
+        configure(args, sink.port)
+        try:
+            started = time.time()
+            seed(args.url, args.users, args.contacts)
+            if args.seed_only:
+                return
+            result = asyncio.run(run(args, sink))
+        finally:
+            sink.stop()
+    report = {"commit": commit(), "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+              "database": args.url.split(":", 1)[0], "users": args.users, "contacts_per_user": args.contacts,
+              "clients": args.clients, "duration_s": args.duration, "in_process": not args.base_url, **result}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
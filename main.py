@@ -1,168 +1,476 @@
-from fastapi import FastAPI, Depends, status, HTTPException, Query
-from src.database.db import get_db
-from sqlalchemy.orm import Session
-from src.schemas import ContactResponse, ContactUpdate, ContactBase
-from src.database.models import Contact, User
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Body, FastAPI, Depends, status, HTTPException, Query, Response, Request
+import orjson
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from src.database.db import get_db, get_engine, get_async_engine, pool_stats
+from src.metrics import MetricsMiddleware, instrument_engine, metrics_response, register_stats
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.schemas import (ContactResponse, ContactUpdate, ContactBase, BulkImportResponse, ContactBatchUpdate,
+                         ContactBatchDelete, ContactBatchResult, ContactMerge, DuplicateCluster)
+from src import contacts as repository_contacts
+from src.contacts import CONTACT_COLUMNS, get_contacts_page, page_size, stream_contacts
+from src.contact_writer import contact_writer
+from src.normalize import normalize_email, normalize_phone
+from src import search, bulk, duplicates
+from src.birthdays import get_upcoming_birthdays, birthday_cache
+from src.contact_cache import contact_cache, etag_matches, make_etag
+from src.database.models import Contact
 from typing import List
-from datetime import date, timedelta
+from datetime import date
 from src.auth_services import auth_service
 from src.auth_routes import router
 from src.routes_users import router_users
-import redis.asyncio as redis
-from src.conf.config import settings
-from fastapi_limiter import FastAPILimiter
+from src.user_cache import AuthPrincipal, user_cache
+from src.email_queue import email_queue
+from src.email import configure_queue
+from src.avatars import avatar_status, get_storage
+from src.redis_pool import redis_pool
+from src.rate_limit import rate_limiter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+from pathlib import Path
 from src.conf.config import settings
 
-app = FastAPI()
+router_contacts = APIRouter()
+
+# the fields PATCH /contacts/{contact_id} and PATCH /contacts/batch change
+UPDATE_FIELDS = ("email", "phone")
 
-app.include_router(router, prefix='/api')
-app.include_router(router_users, prefix='/api')
 
-origins = [settings.origins_url]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    The lifespan function creates the clients of the app on startup and closes them on shutdown.
+    Nothing connects or reads the settings at import time: the engine, Redis, the mail config and Cloudinary
+    are created here or on first use, and the schema is created by Alembic only.
+    """
+    redis_client = redis_pool.open()
+    auth_service.r = redis_client
+    for cache in (user_cache, birthday_cache, contact_cache, email_queue, avatar_status, rate_limiter):
+        cache.bind(redis_client)
+    user_cache.ttl = settings.user_cache_ttl
+    user_cache.local_ttl = settings.user_cache_local_ttl
+    user_cache.local_size = settings.user_cache_local_size
+    contact_cache.ttl = settings.contacts_cache_ttl
+    configure_queue()
+    rate_limiter.sync_interval = settings.rate_limit_sync_interval
+    contact_writer.max_batch = settings.contacts_write_batch_size
+    contact_writer.max_delay = settings.contacts_write_batch_delay
+    instrument_engine(get_engine())
+    instrument_engine(get_async_engine())
+    get_storage()
+    try:
+        yield
+    finally:
+        auth_service.hasher.shutdown()
+        await contact_writer.close()
+        await rate_limiter.close()
+        await redis_pool.close()
+        await get_async_engine().dispose()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-@app.on_event("startup")
-async def startup():
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
+def create_app() -> FastAPI:
+    """
+    The create_app function builds the FastAPI application with its routers, middleware and lifespan.
+    """
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.add_api_route("/", read_root)
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
+    app.include_router(router, prefix='/api')
+    app.include_router(router_users, prefix='/api')
+    app.include_router(router_contacts)
+
+    if settings.avatar_storage == 'local':
+        Path(settings.avatar_local_dir).mkdir(parents=True, exist_ok=True)
+        app.mount(settings.avatar_local_url, StaticFiles(directory=settings.avatar_local_dir), name="avatars")
+
+    register_stats("db_pool", lambda: pool_stats(get_async_engine()))
+    register_stats("password_hasher", auth_service.hasher.metrics)
+    register_stats("contact_writer", contact_writer.metrics)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[settings.origins_url],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(MetricsMiddleware, profile_dir=settings.profile_dir)
+    return app
+
 
-@app.get("/")
 def read_root():
     return {"message": "Welcome to FastAPI!"}
 
-@app.get("/contacts/{params}", response_model=list[ContactResponse], tags=['contacts'])
+
+async def metrics():
+    """
+    The metrics function returns the Prometheus metrics: request latency and SQL statements per route,
+    SQL, Redis and email timings, the database pool and the password hasher.
+    """
+    body, content_type = metrics_response()
+    return Response(content=body, media_type=content_type)
+
+async def contacts_changed(user_id: int) -> None:
+    """
+    The contacts_changed function drops the cached birthdays of the user and starts a new contacts version,
+    so the ETags clients hold stop matching. Call it after every committed change of the user's contacts.
+
+    :param user_id: int: owner of the contacts
+    """
+    await birthday_cache.invalidate(user_id)
+    await contact_cache.bump(user_id)
+
+
+def check_batch(contact_ids: list[int]) -> None:
+    if len(contact_ids) > settings.contacts_batch_max:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {settings.contacts_batch_max} contacts per request")
+    if len(set(contact_ids)) != len(contact_ids):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Duplicate contact id")
+
+
+def version_headers(user_id: int, version: int, contact_id: int | None = None) -> dict:
+    return {"ETag": make_etag(user_id, version, contact_id), "Cache-Control": "private, no-cache"}
+
+
+async def read_contacts_page(user_id: int, db: AsyncSession, cursor: str | None, limit: int):
+    try:
+        return await get_contacts_page(user_id, db, cursor, limit)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+
+@router_contacts.get("/contacts/search", response_model=list[ContactResponse], tags=['contacts'])
 async def search_contacts(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    q: str = Query(None, description="Prefix, part of a word or a word with a typo in any field: "),
+    limit: int = Query(None, ge=1, description="Page size, capped by the server maximum"),
     firstname_: str = Query(None, description="Firstname: "),
     lastname_: str = Query(None, description="Lastname: "),
     email_: str = Query(None, description="Email: "),
-    current_user: User = Depends(auth_service.get_current_user)
+    phone_: str = Query(None, description="Phone: "),
+    current_user: AuthPrincipal = Depends(auth_service.get_current_user)
 ):
     """
     The search_contacts function is used to search contacts from the database.
+    With q the contacts are matched across all fields and ranked by relevance,
+    otherwise the first of firstname_, lastname_, email_ and phone_ is matched exactly.
+    Emails match case-insensitively and phones in any formatting, through their normalized indexed columns.
     :return: contact
-    """       
+    """
+    if q:
+        return await search.search_contacts(current_user.id, q, db, page_size(limit))
+    query = select(*CONTACT_COLUMNS).filter(Contact.user_id==current_user.id)
     if firstname_:
-        contacts = db.query(Contact).filter(Contact.firstname==firstname_, Contact.user_id==current_user.id).all()
+        query = query.filter(Contact.firstname==firstname_)
     elif lastname_:
-        contacts = db.query(Contact).filter(Contact.lastname==lastname_, Contact.user_id==current_user.id).all()
+        query = query.filter(Contact.lastname==lastname_)
     elif email_:
-        contacts = db.query(Contact).filter(Contact.email==email_, Contact.user_id==current_user.id).all()
-    else:
-        contacts = db.query(Contact).filter(Contact.user_id==current_user.id).all()
-
-    return contacts
+        query = query.filter(Contact.email_normalized==normalize_email(email_))
+    elif phone_:
+        query = query.filter(Contact.phone_e164==normalize_phone(phone_))
+    contacts = await db.execute(query)
+    return [row._asdict() for row in contacts.all()]
 
-@app.post("/contacts", response_model=ContactResponse, tags=["contacts"])
-async def create_contact(body: ContactBase, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+@router_contacts.post("/contacts", response_model=ContactResponse, tags=["contacts"])
+async def create_contact(body: ContactBase, db: AsyncSession = Depends(get_db), current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
     """
-    The create_contact function creates a new contact in the database.
+    The create_contact function creates a new contact in the database with one INSERT ... RETURNING.
+    With settings.contacts_write_batching concurrent creates are coalesced into multi-row INSERTs.
 
     :param body: ContactModel: Pass the contact data to the function
-    :param db: Session: Pass the database session to the repository layer
-    :param current_user: User: Get the user id from the jwt token
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user id from the jwt token
     :return: The created contact
     """
-    contact = Contact(**body.model_dump(), user_id=current_user.id)
-    db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    try:
+        if settings.contacts_write_batching:
+            contact = await contact_writer.create(current_user.id, body.model_dump())
+        else:
+            contact = await repository_contacts.create_contact(current_user.id, body.model_dump(), db)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email already exists")
+    await contacts_changed(current_user.id)
     return contact
 
-@app.get("/contacts", response_model=list[ContactResponse], tags=['contacts'])
-async def get_contacts(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+@router_contacts.get("/contacts", response_model=list[ContactResponse], tags=['contacts'])
+async def get_contacts(
+    request: Request,
+    response: Response,
+    cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(None, ge=1, description="Page size, capped by the server maximum"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson streams all contacts"),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthPrincipal = Depends(auth_service.get_current_user)
+):
     """
     The get_contacts function is used to read contacts from the database.
+    Contacts are returned page by page, the cursor of the next page is sent in the X-Next-Cursor header.
+    With format=ndjson all contacts are streamed as newline delimited json instead.
+    Pages are read as plain rows and dumped with orjson, skipping per contact pydantic validation.
+    They carry the ETag of the user's contacts version: a matching If-None-Match gets 304 without
+    a database query, and serialized pages are cached per version.
+
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Collect the ETag and X-Next-Cursor headers
+    :param cursor: str: Cursor of the previous page
+    :param limit: int: Page size
+    :param format: str: json or ndjson
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the current user from the auth_service
+    :return: A list of contacts
+    """
+    if format == "ndjson":
+        return StreamingResponse(stream_contacts(current_user.id, db), media_type="application/x-ndjson")
+    limit = page_size(limit)
+    version = await contact_cache.version(current_user.id)
+    page = None
+    if version is not None:
+        response.headers.update(version_headers(current_user.id, version))
+        if etag_matches(request.headers.get("if-none-match"), response.headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response.headers)
+        page = await contact_cache.get_page(current_user.id, version, f"{cursor}:{limit}")
+    if page is None:
+        contacts, next_cursor = await read_contacts_page(current_user.id, db, cursor, limit)
+        body = orjson.dumps(contacts)
+        if version is not None:
+            await contact_cache.set_page(current_user.id, version, f"{cursor}:{limit}", body, next_cursor)
+    else:
+        body, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=response.headers)
+
+@router_contacts.post("/contacts/bulk", response_model=BulkImportResponse, tags=["contacts"])
+async def import_contacts(request: Request, db: AsyncSession = Depends(get_db),
+                          current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
+    """
+    The import_contacts function creates contacts from a streamed text/csv (with a header row)
+    or application/x-ndjson upload. Rows are validated and inserted in batches, invalid rows are reported.
+
+    :param request: Request: Stream the uploaded body
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user id from the jwt token
+    :return: Numbers of inserted and failed rows with the errors per row
+    """
+    format = bulk.IMPORT_FORMATS.get(request.headers.get("content-type", "").split(";")[0].strip())
+    if format is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Upload text/csv or application/x-ndjson")
+    report = await bulk.import_contacts(current_user.id, request.stream(), format, db)
+    if report.inserted:
+        await contacts_changed(current_user.id)
+    return report
+
+
+@router_contacts.patch("/contacts/batch", response_model=list[ContactBatchResult], tags=["contacts"])
+async def update_contacts(body: list[ContactBatchUpdate] = Body(min_length=1), db: AsyncSession = Depends(get_db),
+                          current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
+    """
+    The update_contacts function applies many patches of PATCH /contacts/{contact_id} in one request.
+    All of them are written by one UPDATE statement in one transaction: a conflict changes nothing.
+
+    :param body: list[ContactBatchUpdate]: patches with the id of the contact
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user id from the jwt token
+    :return: Result per patch in the order of the request, updated or not_found
+    """
+    check_batch([patch.id for patch in body])
+    patches = {patch.id: patch.model_dump(include=set(UPDATE_FIELDS)) for patch in body}
+    try:
+        updated = await repository_contacts.update_contacts(current_user.id, patches, db)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email already exists")
+    if updated:
+        await contacts_changed(current_user.id)
+    return ORJSONResponse([{"id": contact_id, "status": "updated", "contact": updated[contact_id]}
+                           if contact_id in updated else {"id": contact_id, "status": "not_found", "contact": None}
+                           for contact_id in patches])
+
+
+@router_contacts.post("/contacts/batch/delete", response_model=list[ContactBatchResult], tags=["contacts"])
+async def remove_contacts(body: ContactBatchDelete, db: AsyncSession = Depends(get_db),
+                          current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
+    """
+    The remove_contacts function removes many contacts in one request with one DELETE statement.
+
+    :param body: ContactBatchDelete: ids of the contacts
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user id from the jwt token
+    :return: Result per id in the order of the request, deleted or not_found
+    """
+    check_batch(body.ids)
+    deleted = await repository_contacts.delete_contacts(current_user.id, body.ids, db)
+    if deleted:
+        await contacts_changed(current_user.id)
+    return ORJSONResponse([{"id": contact_id, "status": "deleted" if contact_id in deleted else "not_found",
+                            "contact": None} for contact_id in body.ids])
+
+@router_contacts.get("/contacts/export", tags=["contacts"])
+async def export_contacts(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthPrincipal = Depends(auth_service.get_current_user)
+):
+    """
+    The export_contacts function streams all contacts of the user as csv or ndjson, in the format import_contacts reads.
+
+    :param format: str: csv or ndjson
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user id from the jwt token
+    :return: Streamed file
+    """
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(stream_contacts(current_user.id, db, format), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'})
+
+@router_contacts.get("/contacts/duplicates", response_model=list[DuplicateCluster], tags=["contacts"])
+async def find_duplicates(
+    threshold: float = Query(None, ge=0.5, le=1.0, description="Minimal similarity of a pair"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of groups"),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthPrincipal = Depends(auth_service.get_current_user)
+):
+    """
+    The find_duplicates function returns groups of contacts that are probably the same person,
+    found by normalized phone, email and phonetic name keys and scored by similarity, most certain first.
+
+    :param threshold: float: Minimal similarity of a pair
+    :param limit: int: Maximum number of groups
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user id from the jwt token
+    :return: Groups with their contacts and scored pairs
+    """
+    return ORJSONResponse(await duplicates.find_duplicates(current_user.id, db, threshold, limit))
+
+
+@router_contacts.post("/contacts/merge", response_model=list[ContactResponse], tags=["contacts"])
+async def merge_contacts(body: list[ContactMerge], db: AsyncSession = Depends(get_db),
+                         current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
+    """
+    The merge_contacts function merges groups of duplicates in one transaction. Every primary contact is kept,
+    its empty fields are filled from its duplicates, the notes are joined and the duplicates are deleted.
+
+    :param body: list[ContactMerge]: primary contact and its duplicates per group
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user id from the jwt token
+    :return: The merged contacts in the order of the request
+    """
+    check_batch([contact_id for merge in body for contact_id in (merge.primary, *merge.duplicates)])
+    try:
+        merged = await duplicates.merge_contacts(current_user.id, {merge.primary: merge.duplicates for merge in body}, db)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email already exists")
+    if merged is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    await contacts_changed(current_user.id)
+    return ORJSONResponse(merged)
+
+@router_contacts.get("/contacts/birthdays", response_model=list[ContactResponse], tags=['contacts'])
+async def get_birthday(
+    days: int = Query(None, ge=1, le=366, description="Window length, today included"),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthPrincipal = Depends(auth_service.get_current_user)
+):
+    """
+    Get a list of contacts whose birthday falls within the selected time period, 7 days by default.
+    The list is ordered by the date of the birthday and cached in Redis until midnight.
+
+    :param days: int: Length of the period
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the current user from the auth_service
     :return: A list of contacts
     """
-    contacts = db.query(Contact).filter(Contact.user_id==current_user.id).all()
-    return contacts    
+    days = days or settings.birthday_window_days
+    today = date.today()
+    contacts = await birthday_cache.get(current_user.id, days, today)
+    if contacts is None:
+        contacts = await get_upcoming_birthdays(current_user.id, days, db, today)
+        contacts = await birthday_cache.set(current_user.id, days, today, contacts)
+    return contacts
 
-@app.get("/contacts/{contact_id}", response_model=ContactResponse, tags=['contacts'])
-async def get_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+@router_contacts.get("/contacts/{contact_id}", response_model=ContactResponse, tags=['contacts'])
+async def get_contact(contact_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db),
+                      current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
     """
     The get_contact function is used to retrieve a single contact from the database.
+    An If-None-Match with the ETag of this contact gets 304 without a database query.
     
     :param contact_id: int: Specify the id of the contact we want to update
-    :param db: Session: Pass the database session to the function
-    :param current_user: User: Get the current user from the database
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Set the ETag header
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: AuthPrincipal: Get the current user from the database
     :return: A contact object
     """
-    contact = db.query(Contact).filter(id==contact_id, Contact.user_id==current_user.id).first()
+    if_none_match = request.headers.get("if-none-match")
+    version = await contact_cache.version(current_user.id)
+    if version is not None:
+        headers = version_headers(current_user.id, version, contact_id)
+        # * matches any existing contact, only the row lookup can tell whether this one exists
+        if if_none_match and if_none_match.strip() != "*" and etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+    contact = await db.execute(select(*CONTACT_COLUMNS).filter(Contact.id==contact_id,
+                                                               Contact.user_id==current_user.id))
+    contact = contact.first()
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contact 
+    if version is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return contact._asdict()
 
-@app.patch("/contacts/{contact_id}", response_model=ContactResponse, tags=['contacts'])
+@router_contacts.patch("/contacts/{contact_id}", response_model=ContactResponse, tags=['contacts'])
 async def update_contact(
-    contact_id: int, body: ContactUpdate, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)
+    contact_id: int, body: ContactUpdate, db: AsyncSession = Depends(get_db), current_user: AuthPrincipal = Depends(auth_service.get_current_user)
 ):
     """
-    The update_contact function updates a contact in the database.
+    The update_contact function updates a contact in the database with one UPDATE ... RETURNING.
     Params:
     body: A ContactPartialUpdateModel object containing the fields to be updated and their new values.
     contact_id: An integer representing the ID of the contact to be updated.
-    db (optional): A Session object for interacting with an SQLAlchemy database session pool, if not provided, one will be created automatically using Depends(get_db).
+    db (optional): An AsyncSession object for interacting with an SQLAlchemy database session pool, if not provided, one will be created automatically using Depends(get_db).
 
     :param body: ContactPartialUpdateModel: Specify the type of data that will be passed in the body
     :param contact_id: int: Specify the contact that is to be deleted
-    :param db: Session: Pass the database session to the repository layer
-    :param current_user: User: Get the current user from the auth_service
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the current user from the auth_service
     :return: A contact model
     """
-    contact = (db.query(Contact).filter(id==contact_id, Contact.user_id==current_user.id).first()
-    )
+    try:
+        contact = await repository_contacts.update_contact(current_user.id, contact_id,
+                                                           body.model_dump(include=set(UPDATE_FIELDS)), db)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email already exists")
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-
-    contact.email = body.email
-    contact.phone = body.phone
-
-    db.commit()
-    return contact  
-
-@app.get("/contacts/{birthday}", response_model=list[ContactResponse], tags=['contacts'])
-async def get_birthday(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
-    """
-    Get a list of contacts whose birthday falls within the selected time period. The period for 7 days.
-
-    """
-    todaydate = date.today()
-    nextdate = todaydate + timedelta(days=6)
-
-    contact = (db.query(Contact).filter(((Contact.birthdate) <= nextdate)&((Contact.birthdate) >= todaydate), Contact.user_id==current_user.id).all())
-    
-    if contact is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-
+    await contacts_changed(current_user.id)
     return contact
 
-
-@app.delete("/contacts/{contact_id}", status_code=status.HTTP_204_NO_CONTENT, tags=['contacts'])
-async def remove_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+@router_contacts.delete("/contacts/{contact_id}", status_code=status.HTTP_204_NO_CONTENT, tags=['contacts'])
+async def remove_contact(contact_id: int, db: AsyncSession = Depends(get_db), current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
     """
     The remove_contact function removes a contact from the database.
 
     :param contact_id: int: Specify the contact to be removed
-    :param db: Session: Pass the database session to the repository layer
-    :param current_user: User: Get the user that is currently logged in
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: AuthPrincipal: Get the user that is currently logged in
     :return: The contact that has been removed
     """
-    contact = (db.query(Contact).filter(id==contact_id, Contact.user_id==current_user.id).first()
-    )
+    contact = await repository_contacts.delete_contact(current_user.id, contact_id, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    db.delete(contact)
-    db.commit()
+    await contacts_changed(current_user.id)
     return contact
 
 
+def __getattr__(name: str):
+    # the app reads the settings, so it is built on first access, e.g. by uvicorn main:app
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,44 @@
+"""contacts per-user indexes
+
+Revision ID: 5b2e8c4d1a97
+Revises: 7f43090ec54a
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8c4d1a97'
+down_revision: Union[str, None] = '7f43090ec54a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    birth = sa.column('birth')
+    op.drop_index('ix_contacts_email', table_name='contacts')
+    op.drop_index('ix_contacts_firstname', table_name='contacts')
+    op.drop_index('ix_contacts_lastname', table_name='contacts')
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_firstname', 'contacts', ['user_id', 'firstname'], unique=False)
+    op.create_index('ix_contacts_user_id_lastname', 'contacts', ['user_id', 'lastname'], unique=False)
+    op.create_index('ix_contacts_user_id_email', 'contacts', ['user_id', 'email'], unique=True)
+    op.create_index('ix_contacts_user_id_birth', 'contacts', ['user_id', 'birth'], unique=False)
+    op.create_index('ix_contacts_user_id_birth_month_day', 'contacts',
+                    [sa.column('user_id'), sa.extract('month', birth), sa.extract('day', birth)], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birth_month_day', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_birth', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_email', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_lastname', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_firstname', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
+    op.create_index('ix_contacts_lastname', 'contacts', ['lastname'], unique=False)
+    op.create_index('ix_contacts_firstname', 'contacts', ['firstname'], unique=False)
+    op.create_index('ix_contacts_email', 'contacts', ['email'], unique=True)
@@ -0,0 +1,68 @@
+"""contacts full text search
+
+Revision ID: 9d4f1e7a2c36
+Revises: 5b2e8c4d1a97
+Create Date: 2026-10-18 12:40:03.774215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f1e7a2c36'
+down_revision: Union[str, None] = '5b2e8c4d1a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = 'firstname, lastname, email, phone, otherinform'
+COLUMNS = f'user_key, {SEARCH_COLUMNS}'
+DOCUMENT = ("coalesce(firstname, '') || ' ' || coalesce(lastname, '') || ' ' || coalesce(email, '') || ' ' || "
+            "coalesce(phone, '') || ' ' || coalesce(otherinform, '')")
+
+
+def user_key(user_id: str) -> str:
+    # three private-use characters, a single trigram unique to the owner of the contact
+    return (f"char(57344 + ({user_id} / 40960000) % 6400, 57344 + ({user_id} / 6400) % 6400, "
+            f"57344 + ({user_id} / 1) % 6400)")
+
+
+NEW = f"{user_key('new.user_id')}, new.firstname, new.lastname, new.email, new.phone, new.otherinform"
+OLD = f"{user_key('old.user_id')}, old.firstname, old.lastname, old.email, old.phone, old.otherinform"
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(f"CREATE VIEW contacts_fts_source AS SELECT id, {user_key('user_id')} AS user_key, "
+                   f"{SEARCH_COLUMNS} FROM contacts")
+        op.execute(f"CREATE VIRTUAL TABLE contacts_fts USING fts5({COLUMNS}, "
+                   f"content='contacts_fts_source', content_rowid='id', tokenize='trigram')")
+        op.execute(f"CREATE TRIGGER contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+                   f"INSERT INTO contacts_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW}); END")
+        op.execute(f"CREATE TRIGGER contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+                   f"INSERT INTO contacts_fts(contacts_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD}); END")
+        op.execute(f"CREATE TRIGGER contacts_fts_au AFTER UPDATE OF user_id, {SEARCH_COLUMNS} ON contacts BEGIN "
+                   f"INSERT INTO contacts_fts(contacts_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD}); "
+                   f"INSERT INTO contacts_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW}); END")
+        # index the rows that already exist
+        op.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(f"CREATE INDEX ix_contacts_search_trgm ON contacts USING gin (({DOCUMENT}) gin_trgm_ops)")
+        op.execute(f"CREATE INDEX ix_contacts_search_tsv ON contacts USING gin (to_tsvector('simple', {DOCUMENT}))")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER contacts_fts_au")
+        op.execute("DROP TRIGGER contacts_fts_ad")
+        op.execute("DROP TRIGGER contacts_fts_ai")
+        op.execute("DROP TABLE contacts_fts")
+        op.execute("DROP VIEW contacts_fts_source")
+    elif dialect == 'postgresql':
+        op.drop_index('ix_contacts_search_tsv', table_name='contacts')
+        op.drop_index('ix_contacts_search_trgm', table_name='contacts')
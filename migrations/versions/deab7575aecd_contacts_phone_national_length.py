@@ -0,0 +1,76 @@
+"""contacts phone_e164 national length
+
+Revision ID: deab7575aecd
+Revises: e3a71c59b0d4
+Create Date: 2026-10-18 17:13:57.281751
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.conf.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'deab7575aecd'
+down_revision: Union[str, None] = 'e3a71c59b0d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# rows read and updated per statement
+BATCH_SIZE = 1000
+
+# src.normalize as it was when this revision was written: national numbers get the default country code
+# only with 9 or 10 digits, so short junk like 12345 is no longer stored as an E.164 phone
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+NATIONAL_MIN_DIGITS = 9
+NATIONAL_MAX_DIGITS = 10
+_non_digit_re = re.compile(r"\D+")
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    phone = (phone or "").strip()
+    digits = _non_digit_re.sub("", phone)
+    if not phone.startswith("+"):
+        country_code = getattr(settings, 'phone_default_country_code', '380')
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0") or (len(digits) <= NATIONAL_MAX_DIGITS and not digits.startswith(country_code)):
+            national = digits.removeprefix("0")
+            if not NATIONAL_MIN_DIGITS <= len(national) <= NATIONAL_MAX_DIGITS:
+                return None
+            digits = country_code + national
+    if not E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return None
+    return f"+{digits}"
+
+
+contacts = sa.table('contacts', sa.column('id', sa.Integer), sa.column('phone', sa.String),
+                    sa.column('phone_e164', sa.String))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    backfill = (contacts.update().where(contacts.c.id == sa.bindparam('contact_id'))
+                .values(phone_e164=sa.bindparam('phone_value')))
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.select(contacts.c.id, contacts.c.phone, contacts.c.phone_e164)
+                            .where(contacts.c.id > last_id).order_by(contacts.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        # only the phones the stricter rule changes are written
+        changed = [{'contact_id': row.id, 'phone_value': phone} for row in rows
+                   if (phone := normalize_phone(row.phone)) != row.phone_e164]
+        if changed:
+            conn.execute(backfill, changed)
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    # the phones dropped by the stricter rule were never valid, they are not restored
+    pass
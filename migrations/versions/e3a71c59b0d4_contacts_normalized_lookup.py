@@ -0,0 +1,83 @@
+"""contacts normalized phone and email
+
+Revision ID: e3a71c59b0d4
+Revises: 9d4f1e7a2c36
+Create Date: 2026-10-18 16:52:19.304117
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.conf.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a71c59b0d4'
+down_revision: Union[str, None] = '9d4f1e7a2c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# rows read and updated per statement while the existing contacts are backfilled
+BATCH_SIZE = 1000
+
+# src.normalize as it was when this revision was written, copied so later changes there do not alter it
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+NATIONAL_MAX_DIGITS = 10
+_non_digit_re = re.compile(r"\D+")
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    phone = (phone or "").strip()
+    digits = _non_digit_re.sub("", phone)
+    if not phone.startswith("+"):
+        country_code = getattr(settings, 'phone_default_country_code', '380')
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0"):
+            digits = country_code + digits[1:]
+        elif len(digits) <= NATIONAL_MAX_DIGITS and not digits.startswith(country_code):
+            digits = country_code + digits
+    if not E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return None
+    return f"+{digits}"
+
+
+def normalize_email(email: str | None) -> str | None:
+    return (email or "").strip().lower() or None
+
+
+contacts = sa.table('contacts', sa.column('id', sa.Integer), sa.column('phone', sa.String),
+                    sa.column('email', sa.String), sa.column('phone_e164', sa.String),
+                    sa.column('email_normalized', sa.String))
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('phone_e164', sa.String(length=16), nullable=True))
+    op.add_column('contacts', sa.Column('email_normalized', sa.String(length=40), nullable=True))
+    conn = op.get_bind()
+    backfill = (contacts.update().where(contacts.c.id == sa.bindparam('contact_id'))
+                .values(phone_e164=sa.bindparam('phone_value'), email_normalized=sa.bindparam('email_value')))
+    last_id = 0
+    while True:
+        # keyset batches, memory stays flat for any number of contacts
+        rows = conn.execute(sa.select(contacts.c.id, contacts.c.phone, contacts.c.email)
+                            .where(contacts.c.id > last_id).order_by(contacts.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        conn.execute(backfill, [{'contact_id': row.id, 'phone_value': normalize_phone(row.phone),
+                                 'email_value': normalize_email(row.email)} for row in rows])
+        last_id = rows[-1].id
+    # indexes are built once the columns are filled
+    op.create_index('ix_contacts_user_id_phone_e164', 'contacts', ['user_id', 'phone_e164'], unique=False)
+    op.create_index('ix_contacts_user_id_email_normalized', 'contacts', ['user_id', 'email_normalized'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_email_normalized', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_phone_e164', table_name='contacts')
+    op.drop_column('contacts', 'email_normalized')
+    op.drop_column('contacts', 'phone_e164')
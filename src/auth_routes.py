@@ -1,38 +1,49 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request, Response, Query
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
-from src.users import get_user_by_email, create_user, update_token
+from src.users import get_user_by_email, create_user, update_token, update_password
 from src.auth_services import auth_service
 
 from src.email import send_email
 from src.users import confirmed_email as confirmed_mail
 from src.schemas import ContactResponse
-from fastapi_limiter.depends import RateLimiter
+from src.rate_limit import RateLimit
 from src.database.models import User
-from main import get_contacts
+from src.user_cache import AuthPrincipal
+from src.contacts import get_contacts_page
 
 router = APIRouter(prefix='/auth', tags=["auth"])
 security = HTTPBearer()
 
 
 @router.get("/", response_model=List[ContactResponse], description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def read_contacts(skip: int = 0, limit: int = 25, db: Session = Depends(get_db),
-                     current_user: User = Depends(auth_service.get_current_user)):
+            dependencies=[Depends(RateLimit("read_contacts", times=10, seconds=60))])
+async def read_contacts(response: Response, cursor: str = None,
+                        limit: int = Query(None, ge=1, description="Page size, capped by the server maximum"),
+                        db: AsyncSession = Depends(get_db),
+                        current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
     """
-    The function put limit for amount of running function reading contacts for the minute
+    The function put limit for amount of running function reading contacts for the minute.
+    The cursor of the next page is sent in the X-Next-Cursor header.
+    Rows are returned with orjson as they are, the response model only documents them.
     """
-    contacts = await get_contacts(skip, limit, current_user, db)
-    return contacts
+    try:
+        contacts, next_cursor = await get_contacts_page(current_user.id, db, cursor, limit)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return ORJSONResponse(contacts, headers=response.headers)
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: AsyncSession = Depends(get_db)):
     """
     The signup function creates a new user in the database and send them an email to confirm their account.
     It takes in a UserModel object, which is validated by pydantic.
@@ -41,35 +52,39 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
     :param body: UserModel: Get the user's email and password from the request body
     :param background_tasks: BackgroundTasks: Add tasks to the background queue
     :param request: Request: Get the base url of the server
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A dictionary with the user and a detail message
     """
-    exist_user = await get_user_by_email(body.email, db)
+    exist_user = await get_user_by_email(body.email, db, User.id)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await create_user(body, db)
     background_tasks.add_task(send_email, new_user.email, request.base_url)
     return {"user": new_user, "detail": "201 Created. Check your email for confirmation."}
 
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     The login function is used to authenticate a user.
 
     :param body: OAuth2PasswordRequestForm: Get the username and password from the request body
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A dictionary with the access_token, refresh_token and token type
  
     """
-    user = await get_user_by_email(body.username, db)
+    user = await get_user_by_email(body.username, db, User.email, User.password, User.confirmed)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+    if new_hash:
+        # the stored hash uses deprecated settings, replace it while we know the password
+        await update_password(user, new_hash, db)
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
@@ -78,12 +93,12 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
 
 
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     the function confirme email by the token.
     """
     email = await auth_service.get_email_from_token(token)
-    user = await get_user_by_email(email, db)
+    user = await get_user_by_email(email, db, User.confirmed)
     if user is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error")
     if user.confirmed:
@@ -93,20 +108,20 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_db)):
     """
         The refresh_token function is used to refresh the access token.
         The function takes in a refresh token and returns a new access_token and refresh_token pair.
         If the user's current refresh token does not match what was passed into this function, then it will return an error.
 
         :param credentials: HTTPAuthorizationCredentials: Retrieve the token from the header
-        :param db: Session: Access the database
+        :param db: AsyncSession: Access the database
         :return: A dictionary with the access_token, refresh_token and token type
  
     """
     token = credentials.credentials
     email = await auth_service.decode_refresh_token(token)
-    user = await get_user_by_email(email, db)
+    user = await get_user_by_email(email, db, User.email, User.refresh_token)
     if user.refresh_token != token:
         await update_token(user, None, db)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
@@ -119,14 +134,14 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(sec
 
 @router.post('/request_email')
 async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_db)):
     """
     The function checked if user email confirmed.
     :return: str: message about user email confirmation.
     """
-    user = await get_user_by_email(body.email, db)
+    user = await get_user_by_email(body.email, db, User.email, User.confirmed)
 
-    if user.confirmed:
+    if user and user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
         background_tasks.add_task(send_email, user.email, request.base_url)
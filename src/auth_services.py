@@ -6,33 +6,97 @@ from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from functools import cached_property
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.conf.config import settings
-import redis.asyncio as redis
 from fastapi.security import OAuth2PasswordBearer
 
 from src.database.db import get_db
 import src.users as repository_users
+from src.user_cache import AuthPrincipal, user_cache
+from src.hashing import PasswordHasher
+from src.token_cache import TokenCache
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    # hashes below min_rounds are reported as deprecated and replaced on the next login
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__min_rounds=12)
     # SECRET_KEY = "secret_key"
     # ALGORITHM = "HS256"
     # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    SECRET_KEY = settings.secret_key
-    ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    r = None  # client of the shared src.redis_pool, set by the app lifespan
+
+    # the settings are read on first use, so importing the app needs no environment
+    @cached_property
+    def SECRET_KEY(self) -> str:
+        return settings.secret_key
+
+    @cached_property
+    def ALGORITHM(self) -> str:
+        return settings.algorithm
+
+    # RS*/ES*/EdDSA sign with the private key and verify with the public one, HS* use SECRET_KEY for both
+    @cached_property
+    def PRIVATE_KEY_FILE(self) -> str | None:
+        return settings.jwt_private_key_file
+
+    @cached_property
+    def PUBLIC_KEY_FILE(self) -> str | None:
+        return settings.jwt_public_key_file
+
+    @cached_property
+    def hasher(self) -> PasswordHasher:
+        return PasswordHasher(self.pwd_context, settings.password_hash_workers, settings.password_hash_max_queue)
+
+    @cached_property
+    def token_cache(self) -> TokenCache:
+        return TokenCache(settings.token_cache_size)
+
+    def _load_key(self, path: str | None):
+        algorithm = jwt.get_algorithm_by_name(self.ALGORITHM)
+        if self.ALGORITHM.startswith("HS"):
+            return algorithm.prepare_key(self.SECRET_KEY)
+        if path is None:
+            return None
+        with open(path, "rb") as key_file:
+            return algorithm.prepare_key(key_file.read())
+
+    @cached_property
+    def signing_key(self):
+        """
+        The key object tokens are signed with, parsed once
+        """
+        key = self._load_key(self.PRIVATE_KEY_FILE)
+        if key is None:
+            raise RuntimeError(f"jwt_private_key_file is required to sign {self.ALGORITHM} tokens")
+        return key
 
-    def verify_password(self, plain_password, hashed_password):
+    @cached_property
+    def verification_key(self):
+        """
+        The key object tokens are verified with, parsed once
+        """
+        key = self._load_key(self.PUBLIC_KEY_FILE)
+        if key is None:
+            raise RuntimeError(f"jwt_public_key_file is required to verify {self.ALGORITHM} tokens")
+        return key
+
+    async def verify_password(self, plain_password, hashed_password):
         """
         The function checked if the password is equel coded password
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self.hasher.verify(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+    async def verify_and_update_password(self, plain_password, hashed_password):
+        """
+        The function checked the password and returns a new hash if the stored one is deprecated
+        :return: (verified, new hash or None)
+        """
+        return await self.hasher.verify_and_update(plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str):
+        return await self.hasher.hash(password)
 
     # define a function to generate a new access token
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -45,7 +109,7 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_access_token = jwt.encode(to_encode, self.signing_key, algorithm=self.ALGORITHM)
         return encoded_access_token
 
     # define a function to generate a new refresh token
@@ -60,7 +124,7 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(days=7)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_refresh_token = jwt.encode(to_encode, self.signing_key, algorithm=self.ALGORITHM)
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
@@ -69,7 +133,7 @@ class Auth:
         :return: user email
         """
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = jwt.decode(refresh_token, self.verification_key, algorithms=[self.ALGORITHM])
             if payload['scope'] == 'refresh_token':
                 email = payload['sub']
                 return email
@@ -77,9 +141,10 @@ class Auth:
         except PyJWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def get_current_user(self, token: str = Depends(oauth2_scheme),
+                               db: AsyncSession = Depends(get_db)) -> AuthPrincipal:
         """
-        function return current user by the token
+        function return current user by the token, as an AuthPrincipal read from the cache or a column query
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,21 +152,25 @@ class Auth:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-        try:
-            # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload['scope'] == 'access_token':
-                email = payload["sub"]
-                if email is None:
-                    raise credentials_exception
-            else:
+        payload = self.token_cache.get(token)
+        if payload is None:
+            try:
+                # Decode JWT
+                payload = jwt.decode(token, self.verification_key, algorithms=[self.ALGORITHM])
+            except PyJWTError as e:
                 raise credentials_exception
-        except PyJWTError as e:
-            raise credentials_exception
+            if payload.get('scope') != 'access_token' or payload.get("sub") is None:
+                raise credentials_exception
+            self.token_cache.set(token, payload)
+        email = payload["sub"]
 
-        user = await repository_users.get_user_by_email(email, db)
+        user = await user_cache.get(email)
+        if user is not None:
+            return user
+        user = await repository_users.get_principal_by_email(email, db)
         if user is None:
             raise credentials_exception
+        await user_cache.set(user)
         return user
     
 
@@ -112,7 +181,7 @@ class Auth:
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=7)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        token = jwt.encode(to_encode, self.signing_key, algorithm=self.ALGORITHM)
         return token
     
     
@@ -121,7 +190,7 @@ class Auth:
         Get the user email by the token
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = jwt.decode(token, self.verification_key, algorithms=[self.ALGORITHM])
             email = payload["sub"]
             return email
         except PyJWTError as e:
@@ -130,5 +199,4 @@ class Auth:
                                 detail="Invalid token for email verification")
 
 
-
 auth_service = Auth()
\ No newline at end of file
@@ -0,0 +1,170 @@
+import abc
+import asyncio
+import hashlib
+import io
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from redis.exceptions import RedisError
+
+from src import users as repository_users
+from src.conf.config import settings
+from src.database.db import async_session
+
+logger = logging.getLogger(__name__)
+
+
+def resize_avatar(data: bytes, size: int = 250) -> bytes:
+    """
+    Decode an uploaded image, crop it to a size x size square and encode it as JPEG.
+    Large JPEG photos are decoded at a reduced scale, so a 12 Mpx phone photo is never fully unpacked.
+    CPU bound, run it in an executor.
+
+    :param data: bytes: uploaded file
+    :param size: int: side of the square in pixels
+    :return: bytes: JPEG image
+    :raises ValueError: the data is not an image or it is too large
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (size * 2, size * 2))
+            image = ImageOps.exif_transpose(image)
+            image = ImageOps.fit(image.convert("RGB"), (size, size), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+        raise ValueError(f"Invalid image: {err}") from err
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+class AvatarStorage(abc.ABC):
+    """
+    Where the resized avatars are kept.
+    """
+
+    @abc.abstractmethod
+    async def save(self, key: str, data: bytes) -> str:
+        """
+        Store the image under key.
+
+        :param key: str: owner of the avatar, the user email
+        :param data: bytes: JPEG image
+        :return: str: public URL of the stored image
+        """
+
+
+class LocalAvatarStorage(AvatarStorage):
+    """
+    Stores avatars as files under root, served by the app under base_url. Works offline.
+    Files are named by the digest of the key, so emails never end up in paths.
+    """
+
+    def __init__(self, root: str | Path, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    async def save(self, key: str, data: bytes) -> str:
+        name = f"{hashlib.sha256(key.encode()).hexdigest()}.jpg"
+        await asyncio.to_thread(self._write, self.root / name, data)
+        version = hashlib.sha256(data).hexdigest()[:12]
+        return f"{self.base_url}/{name}?v={version}"
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+
+class CloudinaryAvatarStorage(AvatarStorage):
+    """
+    Uploads avatars to Cloudinary. The client is configured once, the blocking upload runs in a thread.
+    """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str):
+        import cloudinary
+        import cloudinary.uploader
+
+        self.cloudinary = cloudinary
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+
+    async def save(self, key: str, data: bytes) -> str:
+        public_id = f"Contacts/{key}"
+        r = await asyncio.to_thread(self.cloudinary.uploader.upload, data, public_id=public_id, overwrite=True)
+        return self.cloudinary.CloudinaryImage(public_id).build_url(version=r.get("version"))
+
+
+@lru_cache(maxsize=None)
+def get_storage() -> AvatarStorage:
+    """
+    The storage selected by settings.avatar_storage: "cloudinary" or "local", created and configured once.
+    """
+    if settings.avatar_storage == "local":
+        return LocalAvatarStorage(settings.avatar_local_dir, settings.avatar_local_url)
+    return CloudinaryAvatarStorage(settings.cloudinary_name, settings.cloudinary_api_key,
+                                   settings.cloudinary_api_secret)
+
+
+class AvatarStatus:
+    """
+    Redis record of the last avatar upload of a user: pending, done with the url or failed.
+    """
+
+    def __init__(self, redis_client=None, ttl: int = 3600):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def bind(self, redis_client) -> None:
+        """
+        Attach the Redis client.
+        """
+        self.redis = redis_client
+
+    @staticmethod
+    def key(email: str) -> str:
+        return f"avatar:{email}"
+
+    async def get(self, email: str) -> dict | None:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self.key(email))
+        except RedisError:
+            return None
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, email: str, status: str, avatar: str | None = None, detail: str | None = None) -> dict:
+        data = {"status": status, "avatar": avatar, "detail": detail}
+        if self.redis is not None:
+            try:
+                await self.redis.set(self.key(email), json.dumps(data), ex=self.ttl)
+            except RedisError:
+                pass
+        return data
+
+
+avatar_status = AvatarStatus()
+
+
+async def store_avatar(email: str, image: bytes, storage: AvatarStorage | None = None) -> None:
+    """
+    Background job: upload the resized avatar and save its url to the user.
+    The outcome is recorded in avatar_status.
+
+    :param email: str: user email
+    :param image: bytes: resized avatar
+    :param storage: AvatarStorage: target storage, get_storage() by default
+    """
+    try:
+        url = await (storage or get_storage()).save(email, image)
+        async with async_session() as db:
+            await repository_users.update_avatar(email, url, db)
+    except Exception as err:
+        logger.exception("avatar upload for %s failed", email)
+        await avatar_status.set(email, "failed", detail=str(err))
+        return
+    await avatar_status.set(email, "done", avatar=url)
@@ -0,0 +1,138 @@
+import calendar
+import json
+from datetime import date, datetime, time, timedelta
+
+from redis.exceptions import RedisError
+from sqlalchemy import Row, select, extract, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Contact
+from src.contacts import CONTACT_COLUMNS
+from src.schemas import contact_list_adapter
+
+
+def month_day_ranges(start: date, days: int) -> list[tuple[int, int, int]] | None:
+    """
+    The month_day_ranges function turns the window start..start+days-1 into (month, first day, last day) ranges.
+    The window may wrap from December to January and back into the month it starts in, the ranges never overlap.
+    In non-leap years February 29 birthdays are celebrated on the 28th.
+
+    :param start: date: first day of the window
+    :param days: int: length of the window
+    :return: ranges in the order of the window, None if the window covers every day of the year
+    """
+    ranges = []
+    covered = set()
+    for offset in range(min(days, 366)):
+        day = start + timedelta(days=offset)
+        last_day = 29 if day.month == 2 and day.day == 28 and not calendar.isleap(day.year) else day.day
+        covered.update((day.month, d) for d in range(day.day, last_day + 1))
+        if ranges and ranges[-1][0] == day.month and ranges[-1][2] == day.day - 1:
+            ranges[-1] = (day.month, ranges[-1][1], last_day)
+        else:
+            ranges.append((day.month, day.day, last_day))
+    if len(covered) == 366:
+        return None
+    return ranges
+
+
+def next_birthday(birthdate: date, today: date) -> date:
+    """
+    The next_birthday function returns the date of the next birthday on or after today.
+    """
+    for year in (today.year, today.year + 1):
+        day = birthdate.day
+        if birthdate.month == 2 and day == 29 and not calendar.isleap(year):
+            day = 28
+        upcoming = date(year, birthdate.month, day)
+        if upcoming >= today:
+            return upcoming
+
+
+def upcoming_birthdays_query(user_id: int, days: int, today: date):
+    """
+    The upcoming_birthdays_query function matches birthdays on month and day,
+    which is served by the (user_id, month, day) expression index.
+    """
+    query = select(*CONTACT_COLUMNS).filter(Contact.user_id == user_id, Contact.birthdate.isnot(None))
+    ranges = month_day_ranges(today, days)
+    if ranges is None:
+        return query
+    month = extract('month', Contact.birthdate)
+    day = extract('day', Contact.birthdate)
+    return query.filter(or_(*(and_(month == m, day.between(first, last)) for m, first, last in ranges)))
+
+
+async def get_upcoming_birthdays(user_id: int, days: int, db: AsyncSession, today: date | None = None) -> list[Row]:
+    """
+    The get_upcoming_birthdays function returns the user's contacts whose birthday falls within the next days,
+    ordered by the date of the birthday.
+
+    :param user_id: int: owner of the contacts
+    :param days: int: length of the window, today included
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param today: date: first day of the window, date.today() by default
+    :return: rows with the columns of ContactResponse
+    """
+    today = today or date.today()
+    contacts = await db.execute(upcoming_birthdays_query(user_id, days, today))
+    return sorted(contacts.all(), key=lambda contact: (next_birthday(contact.birthdate, today), contact.id))
+
+
+class BirthdayCache:
+    """
+    Per-user Redis cache of the upcoming birthdays lists.
+    All lists of a user live in one hash that expires at midnight, so the dashboard polling
+    the endpoint hits the database once a day per window. Contact changes drop the hash.
+    """
+
+    def __init__(self, redis_client=None):
+        self.redis = redis_client
+
+    def bind(self, redis_client) -> None:
+        """
+        Attach the Redis client.
+        """
+        self.redis = redis_client
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"birthdays:{user_id}"
+
+    async def get(self, user_id: int, days: int, today: date) -> list[dict] | None:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.hget(self.key(user_id), f"{today.isoformat()}:{days}")
+        except RedisError:
+            return None
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, user_id: int, days: int, today: date, contacts: list[Row]) -> list[dict]:
+        data = contact_list_adapter.dump_python(contact_list_adapter.validate_python(contacts, from_attributes=True),
+                                                mode="json")
+        if self.redis is None:
+            return data
+        midnight = datetime.combine(today + timedelta(days=1), time.min)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(self.key(user_id), f"{today.isoformat()}:{days}", json.dumps(data))
+                pipe.expireat(self.key(user_id), midnight)
+                await pipe.execute()
+        except RedisError:
+            pass
+        return data
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        Drop the cached lists of the user. Must be called after every change of the user's contacts.
+        """
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self.key(user_id))
+        except RedisError:
+            pass
+
+
+birthday_cache = BirthdayCache()
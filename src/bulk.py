@@ -0,0 +1,156 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.models import Contact
+from src.normalize import normalized_columns
+from src.schemas import ContactBase, BulkImportResponse, BulkRowError
+
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+# longest CSV record kept in memory while its quoted field is not closed
+CSV_RECORD_MAX_CHARS = 65536
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    The iter_lines function splits a stream of byte chunks into utf-8 lines, whatever the chunk boundaries are.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[list[str] | str]:
+    """
+    The iter_csv_rows function joins the lines of a CSV record whose quoted field holds line breaks
+    and parses every record with csv.reader, as csv.DictWriter of the export writes them.
+
+    :param lines: AsyncIterator[str]: lines of the upload
+    :return: iterator of the values of every record, or an error message if its quoted field is never closed
+    """
+    record = []
+    size = quotes = 0
+    async for line in lines:
+        if not record and not line.strip():
+            continue
+        record.append(line + "\n")
+        size += len(line)
+        quotes += line.count('"')
+        if quotes % 2 and size <= CSV_RECORD_MAX_CHARS:
+            continue
+        yield next(csv.reader(record)) if quotes % 2 == 0 else "unterminated quoted field"
+        record = []
+        size = quotes = 0
+    if record:
+        yield "unterminated quoted field"
+
+
+async def iter_records(chunks: AsyncIterator[bytes], format: str) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    The iter_records function parses an uploaded CSV (with a header row) or NDJSON stream record by record.
+
+    :param chunks: AsyncIterator[bytes]: request body
+    :param format: str: csv or ndjson
+    :return: iterator of (row number, record), the record is an error message if it can not be parsed
+    """
+    row = 0
+    if format == "csv":
+        header = None
+        async for values in iter_csv_rows(iter_lines(chunks)):
+            if header is None:
+                header = [name.strip() for name in values] if isinstance(values, list) else []
+                continue
+            row += 1
+            if isinstance(values, str):
+                yield row, values
+            elif len(values) != len(header):
+                yield row, f"expected {len(header)} columns, got {len(values)}"
+            else:
+                yield row, dict(zip(header, values))
+        return
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as err:
+            yield row, f"invalid json: {err}"
+            continue
+        yield row, record if isinstance(record, dict) else "expected a json object"
+
+
+async def _insert_batch(user_id: int, batch: list[tuple[int, dict]], db: AsyncSession,
+                        report: BulkImportResponse) -> None:
+    if not batch:
+        return
+    try:
+        await db.execute(insert(Contact), [values | {"user_id": user_id} for _, values in batch])
+        await db.commit()
+        report.inserted += len(batch)
+        return
+    except IntegrityError:
+        await db.rollback()
+    # some row of the batch breaks a constraint, find it row by row
+    for row, values in batch:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(Contact), [values | {"user_id": user_id}])
+            report.inserted += 1
+        except IntegrityError:
+            _fail(report, row, "contact with this email already exists")
+    await db.commit()
+
+
+def _fail(report: BulkImportResponse, row: int, detail: str) -> None:
+    report.failed += 1
+    if len(report.errors) < settings.bulk_error_report_limit:
+        report.errors.append(BulkRowError(row=row, detail=detail))
+
+
+async def import_contacts(user_id: int, chunks: AsyncIterator[bytes], format: str,
+                          db: AsyncSession) -> BulkImportResponse:
+    """
+    The import_contacts function validates the uploaded contacts against ContactBase and inserts them
+    with one executemany per batch of settings.bulk_batch_size rows, every batch in its own transaction.
+    Invalid rows are skipped and reported, the rest of the upload goes on.
+
+    :param user_id: int: owner of the contacts
+    :param chunks: AsyncIterator[bytes]: request body
+    :param format: str: csv or ndjson
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: numbers of inserted and failed rows and the errors of the first settings.bulk_error_report_limit rows
+    """
+    report = BulkImportResponse()
+    batch = []
+    async for row, record in iter_records(chunks, format):
+        if isinstance(record, str):
+            _fail(report, row, record)
+            continue
+        try:
+            batch.append((row, normalized_columns(ContactBase.model_validate(record).model_dump())))
+        except ValidationError as err:
+            _fail(report, row, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in err.errors()))
+        if len(batch) >= settings.bulk_batch_size:
+            await _insert_batch(user_id, batch, db, report)
+            batch = []
+    await _insert_batch(user_id, batch, db, report)
+    return report
@@ -1,10 +1,21 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     sqlalchemy_database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    sqlite_busy_timeout: int = 5000  # ms
     secret_key: str
     algorithm: str
+    jwt_private_key_file: str | None = None
+    jwt_public_key_file: str | None = None
+    token_cache_size: int = 4096
     mail_username: str
     mail_password: str
     mail_from: str
@@ -12,15 +23,70 @@ class Settings(BaseSettings):
     mail_server: str
     redis_host: str = 'localhost'
     redis_port: int = 6379
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 2.0  # wait for a free connection
+    redis_socket_timeout: float = 5.0
+    redis_connect_timeout: float = 2.0
+    redis_health_check_interval: int = 30
+    rate_limit_enabled: bool = True
+    rate_limits: dict[str, str] = {}  # route name -> "times/seconds"
+    rate_limit_sync_interval: float = 1.0
+    user_cache_ttl: int = 300
+    user_cache_local_ttl: int = 5
+    user_cache_local_size: int = 1024
+    contacts_page_size: int = 25
+    contacts_page_size_max: int = 100
+    contacts_stream_batch: int = 1000
+    contacts_cache_ttl: int = 300
+    contacts_write_batching: bool = False  # coalesce concurrent creates into multi-row INSERTs
+    contacts_write_batch_size: int = 100
+    contacts_write_batch_delay: float = 0.002  # seconds a create waits for others to join its batch
+    birthday_window_days: int = 7
+    phone_default_country_code: str = "380"  # for phones written without one, see src.normalize
+    bulk_batch_size: int = 1000
+    bulk_error_report_limit: int = 1000
+    contacts_batch_max: int = 1000  # items per batch update or delete request
+    duplicates_threshold: float = 0.8  # minimal similarity of two contacts reported as duplicates
+    duplicates_window: int = 20  # neighbours compared inside one blocking key, keeps huge blocks linear
+    password_hash_workers: int = 0  # 0 means one per core
+    password_hash_max_queue: int = 64
+    email_batch_size: int = 50
+    email_smtp_pool_size: int = 2
+    email_max_attempts: int = 5
+    email_retry_backoff: float = 30.0
+    email_dedupe_ttl: int = 600
     origins_url: str
+    profile_dir: str | None = None  # set to allow X-Profile requests
+    email_worker_metrics_port: int | None = None
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
+    avatar_storage: str = 'cloudinary'  # or 'local'
+    avatar_local_dir: str = 'static/avatars'
+    avatar_local_url: str = '/static/avatars'
+    avatar_size: int = 250
+    avatar_max_bytes: int = 10 * 1024 * 1024
 
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
-        
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Read the settings from the environment and .env once, on first use.
+    """
+    return Settings()
+
+
+class LazySettings:
+    """
+    Stands in for the Settings instance so importing this module reads no environment.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+
+settings = LazySettings()
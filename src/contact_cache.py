@@ -0,0 +1,131 @@
+import json
+import time
+
+from redis.exceptions import RedisError
+
+
+def make_etag(user_id: int, version: int, contact_id: int | None = None) -> str:
+    """
+    Strong ETag of the contacts representations of the user at the given version.
+    A single contact gets its own, so the ETag of one URL never answers another.
+
+    :param user_id: int: owner of the contacts
+    :param version: int: version from ContactCache.version
+    :param contact_id: int: id of the contact, None for the lists
+    :return: str: quoted ETag
+    """
+    if contact_id is None:
+        return f'"c{user_id}-{version}"'
+    return f'"c{user_id}-{version}-{contact_id}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check the If-None-Match header of a GET against the current ETag (RFC 9110 weak comparison).
+
+    :param if_none_match: str: header value, None if not sent
+    :param etag: str: current ETag
+    :return: bool: True if the client copy is current and 304 can be sent
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ContactCache:
+    """
+    Per-user version counter of the contacts and a Redis cache of serialized contact pages.
+
+    The version is bumped by every create, update and delete, so it makes a strong ETag for all
+    contact reads of the user: a matching If-None-Match is answered with 304 before the database is queried.
+    Pages are cached under the version they were read at, so a bump makes the old ones unreachable
+    and they simply expire. Without Redis there is no version, and reads go to the database without ETags.
+    """
+
+    def __init__(self, redis_client=None, ttl: int = 300):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def bind(self, redis_client) -> None:
+        """
+        Attach the Redis client.
+        """
+        self.redis = redis_client
+
+    @staticmethod
+    def version_key(user_id: int) -> str:
+        return f"contacts:version:{user_id}"
+
+    @staticmethod
+    def page_key(user_id: int, version: int, variant: str) -> str:
+        return f"contacts:page:{user_id}:{version}:{variant}"
+
+    async def version(self, user_id: int) -> int | None:
+        """
+        Current version of the user's contacts.
+        A lost counter starts again from the clock, so it never repeats a version a client may hold.
+
+        :param user_id: int: owner of the contacts
+        :return: int: version, None if Redis is unavailable
+        """
+        if self.redis is None:
+            return None
+        try:
+            # one round trip: SET NX is a no-op for an existing counter
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self.version_key(user_id), time.time_ns(), nx=True)
+                pipe.get(self.version_key(user_id))
+                _, version = await pipe.execute()
+        except RedisError:
+            return None
+        return None if version is None else int(version)
+
+    async def bump(self, user_id: int) -> None:
+        """
+        Start a new version. Must be called after every change of the user's contacts.
+
+        :param user_id: int: owner of the contacts
+        """
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self.version_key(user_id), time.time_ns(), nx=True)
+                pipe.incr(self.version_key(user_id))
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    async def get_page(self, user_id: int, version: int, variant: str) -> tuple[bytes, str | None] | None:
+        """
+        Get a cached page.
+
+        :param user_id: int: owner of the contacts
+        :param version: int: version the page must belong to
+        :param variant: str: query parameters that select the page
+        :return: serialized body and the next cursor, None on a miss
+        """
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self.page_key(user_id, version, variant))
+        except RedisError:
+            return None
+        if raw is None:
+            return None
+        page = json.loads(raw)
+        return page["body"].encode(), page["next"]
+
+    async def set_page(self, user_id: int, version: int, variant: str, body: bytes, next_cursor: str | None) -> None:
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self.page_key(user_id, version, variant),
+                                 json.dumps({"body": body.decode(), "next": next_cursor}), ex=self.ttl)
+        except RedisError:
+            pass
+
+
+contact_cache = ContactCache()
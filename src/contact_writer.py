@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from src.contacts import CONTACT_COLUMNS
+from src.database.db import async_session
+from src.database.models import Contact
+from src.normalize import normalized_columns
+
+logger = logging.getLogger(__name__)
+
+
+class ContactWriter:
+    """
+    Micro-batching writer for new contacts.
+
+    Creates arriving from many requests within max_delay seconds are coalesced into one multi-row
+    INSERT ... RETURNING committed in its own session, so a burst of creates costs one round trip and one
+    commit instead of one each. Every caller still gets its own row back, or its own error: when a row breaks
+    a constraint the batch is replayed row by row in savepoints and only the offending callers fail.
+    A batch is flushed as soon as it has max_batch rows. Disabled unless settings.contacts_write_batching is set.
+    """
+
+    def __init__(self, max_batch: int = 100, max_delay: float = 0.002, session_factory=async_session):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.session_factory = session_factory
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def create(self, user_id: int, values: dict) -> dict:
+        """
+        Queue a contact for the next batch and wait until it is committed.
+
+        :param user_id: int: owner of the contact
+        :param values: dict: fields of ContactBase
+        :return: the created contact with the fields of ContactResponse
+        :raises IntegrityError: the user already has a contact with this email
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((normalized_columns(values) | {"user_id": user_id}, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        statement = insert(Contact).returning(*CONTACT_COLUMNS, sort_by_parameter_order=True)
+        try:
+            async with self.session_factory() as db:
+                try:
+                    result = await db.execute(statement, [values for values, _ in batch])
+                    contacts = [row._asdict() for row in result.all()]
+                    await db.commit()
+                except IntegrityError:
+                    await db.rollback()
+                    await self._replay(batch, db)
+                    return
+        except Exception as err:
+            logger.exception("contact batch of %s rows failed", len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), contact in zip(batch, contacts):
+            if not future.done():
+                future.set_result(contact)
+
+    async def _replay(self, batch: list[tuple[dict, asyncio.Future]], db) -> None:
+        # some row breaks a constraint, insert row by row so only its caller fails
+        results = []
+        for values, future in batch:
+            try:
+                async with db.begin_nested():
+                    row = (await db.execute(insert(Contact).values(**values).returning(*CONTACT_COLUMNS))).one()
+                results.append((future, row._asdict()))
+            except IntegrityError as err:
+                results.append((future, err))
+        await db.commit()
+        self.batches += 1
+        self.rows += len(batch)
+        for future, result in results:
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """
+        Flush what is queued and wait for running batches. Call on shutdown.
+        """
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def metrics(self) -> dict:
+        return {"batches_total": self.batches, "rows_total": self.rows, "pending": len(self._pending)}
+
+
+contact_writer = ContactWriter()
@@ -0,0 +1,222 @@
+import base64
+import csv
+import io
+from typing import AsyncIterator
+
+import orjson
+
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.models import Contact
+from src.normalize import normalized_columns
+from src.schemas import ContactResponse
+
+
+def encode_cursor(contact_id: int) -> str:
+    """
+    The encode_cursor function packs the id of the last returned contact into an opaque cursor.
+
+    :param contact_id: int: id of the last contact on the page
+    :return: url-safe cursor string
+    """
+    return base64.urlsafe_b64encode(f"id:{contact_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    The decode_cursor function unpacks a cursor made by encode_cursor.
+
+    :param cursor: str: cursor from the previous page
+    :return: id of the last contact on the previous page
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, contact_id = raw.split(":", 1)
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(contact_id)
+    except (UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+# the columns of ContactResponse, read as plain rows: no ORM identity map and no pydantic validation
+# on the way out, the database types already match the response model
+CONTACT_COLUMNS = tuple(getattr(Contact, name) for name in ContactResponse.model_fields)
+
+
+def page_size(limit: int | None) -> int:
+    """
+    The page_size function returns the requested page size capped by settings.contacts_page_size_max,
+    settings.contacts_page_size if none is requested.
+
+    :param limit: int: requested page size or None
+    :return: int: page size
+    """
+    if limit is None:
+        limit = settings.contacts_page_size
+    return max(1, min(limit, settings.contacts_page_size_max))
+
+
+async def get_contacts_page(user_id: int, db: AsyncSession, cursor: str | None = None,
+                            limit: int | None = None) -> tuple[list[dict], str | None]:
+    """
+    The get_contacts_page function reads one page of the user's contacts ordered by id.
+    Pages are addressed by the keyset on Contact.id, so the cost of a page does not grow with its position.
+    Contacts are returned as dicts with the fields of ContactResponse, ready for orjson.
+
+    :param user_id: int: owner of the contacts
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param cursor: str: cursor of the previous page, None for the first page
+    :param limit: int: page size, see page_size
+    :return: contacts of the page and the cursor of the next page or None on the last page
+    """
+    limit = page_size(limit)
+    query = select(*CONTACT_COLUMNS).filter(Contact.user_id == user_id)
+    if cursor:
+        query = query.filter(Contact.id > decode_cursor(cursor))
+    result = await db.execute(query.order_by(Contact.id).limit(limit + 1))
+    contacts = [row._asdict() for row in result.all()]
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        return contacts, encode_cursor(contacts[-1]["id"])
+    return contacts, None
+
+
+async def create_contact(user_id: int, values: dict, db: AsyncSession) -> dict:
+    """
+    The create_contact function inserts a contact and reads it back in the same statement (INSERT ... RETURNING).
+
+    :param user_id: int: owner of the contact
+    :param values: dict: fields of ContactBase
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: the created contact with the fields of ContactResponse
+    :raises IntegrityError: the user already has a contact with this email
+    """
+    result = await db.execute(insert(Contact).values(**normalized_columns(values), user_id=user_id).returning(*CONTACT_COLUMNS))
+    contact = result.one()._asdict()
+    await db.commit()
+    return contact
+
+
+async def update_contact(user_id: int, contact_id: int, values: dict, db: AsyncSession) -> dict | None:
+    """
+    The update_contact function changes a contact of the user with one UPDATE ... RETURNING, no SELECT before it.
+
+    :param user_id: int: owner of the contact, a contact of another user is never matched
+    :param contact_id: int: id of the contact
+    :param values: dict: columns to change
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: the updated contact or None if the user has no such contact
+    """
+    result = await db.execute(update(Contact).where(Contact.id == contact_id, Contact.user_id == user_id)
+                              .values(**normalized_columns(values)).returning(*CONTACT_COLUMNS)
+                              .execution_options(synchronize_session=False))
+    contact = result.first()
+    await db.commit()
+    return None if contact is None else contact._asdict()
+
+
+async def delete_contact(user_id: int, contact_id: int, db: AsyncSession) -> dict | None:
+    """
+    The delete_contact function removes a contact of the user with one DELETE ... RETURNING.
+
+    :param user_id: int: owner of the contact
+    :param contact_id: int: id of the contact
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: the removed contact or None if the user has no such contact
+    """
+    result = await db.execute(delete(Contact).where(Contact.id == contact_id, Contact.user_id == user_id)
+                              .returning(*CONTACT_COLUMNS).execution_options(synchronize_session=False))
+    contact = result.first()
+    await db.commit()
+    return None if contact is None else contact._asdict()
+
+
+
+def batch_update_statement(user_id: int, patches: dict[int, dict]):
+    """
+    The batch_update_statement function builds one set-based statement changing many contacts of the user:
+    UPDATE contacts SET column = CASE id WHEN ... END WHERE user_id = ... AND id IN (...) RETURNING ...
+
+    :param user_id: int: owner of the contacts, contacts of other users are never matched
+    :param patches: dict[int, dict]: columns to change by contact id, at least one
+    :return: the UPDATE statement returning CONTACT_COLUMNS of the changed contacts
+    """
+    patches = {contact_id: normalized_columns(patch) for contact_id, patch in patches.items()}
+    values = {}
+    for name in {name for patch in patches.values() for name in patch}:
+        column = getattr(Contact, name)
+        values[column] = case({contact_id: patch[name] for contact_id, patch in patches.items() if name in patch},
+                              value=Contact.id, else_=column)
+    return (update(Contact).where(Contact.user_id == user_id, Contact.id.in_(patches))
+            .values(values).returning(*CONTACT_COLUMNS).execution_options(synchronize_session=False))
+
+
+async def update_contacts(user_id: int, patches: dict[int, dict], db: AsyncSession) -> dict[int, dict]:
+    """
+    The update_contacts function changes many contacts of the user with one batch_update_statement.
+    Either every matched contact is changed or, on an error, none.
+
+    :param user_id: int: owner of the contacts
+    :param patches: dict[int, dict]: columns to change by contact id
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: the updated contacts by id, ids the user does not own are missing
+    :raises IntegrityError: a change would give the user two contacts with the same email
+    """
+    if not patches:
+        return {}
+    result = await db.execute(batch_update_statement(user_id, patches))
+    contacts = {row.id: row._asdict() for row in result.all()}
+    await db.commit()
+    return contacts
+
+
+async def delete_contacts(user_id: int, contact_ids: list[int], db: AsyncSession) -> set[int]:
+    """
+    The delete_contacts function removes many contacts of the user with one DELETE ... WHERE id IN (...) RETURNING id.
+
+    :param user_id: int: owner of the contacts
+    :param contact_ids: list[int]: ids of the contacts
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: ids of the removed contacts, ids the user does not own are missing
+    """
+    result = await db.execute(delete(Contact).where(Contact.user_id == user_id, Contact.id.in_(contact_ids))
+                              .returning(Contact.id).execution_options(synchronize_session=False))
+    deleted = set(result.scalars().all())
+    await db.commit()
+    return deleted
+
+
+CSV_COLUMNS = ('id', 'firstname', 'lastname', 'email', 'phone', 'birthdate', 'otherinform')
+
+
+def _csv_lines(rows: list[dict]) -> str:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+async def stream_contacts(user_id: int, db: AsyncSession, format: str = "ndjson") -> AsyncIterator[bytes]:
+    """
+    The stream_contacts function yields all contacts of the user as NDJSON lines or as CSV with a header row.
+    Rows are fetched in batches of settings.contacts_stream_batch, so memory stays flat for any number of contacts.
+
+    :param user_id: int: owner of the contacts
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param format: str: ndjson or csv
+    :return: iterator of encoded chunks, one per batch
+    """
+    query = (select(*CONTACT_COLUMNS).filter(Contact.user_id == user_id).order_by(Contact.id)
+             .execution_options(yield_per=settings.contacts_stream_batch))
+    if format == "csv":
+        yield _csv_lines([dict(zip(CSV_COLUMNS, CSV_COLUMNS))]).encode()
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        contacts = [row._asdict() for row in partition]
+        if format == "csv":
+            yield _csv_lines(contacts).encode()
+        else:
+            yield b"".join(orjson.dumps(contact) + b"\n" for contact in contacts)
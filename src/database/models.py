@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Index, extract, event, DDL
 # from sqlalchemy.sql.sqltypes import DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.ext.declarative import declarative_base
-from src.database.db import engine
+
+from src.normalize import normalize_email, normalize_phone
 
 Base = declarative_base()
 
@@ -10,14 +11,98 @@ class Contact(Base):
     __tablename__ = "contacts"
     id = Column(Integer, primary_key=True, autoincrement=True)
     # id = Column(Integer, primary_key=True, index=True)
-    firstname = Column(String(50), nullable=False, index=True)
-    lastname = Column(String(50), index=True)
-    email = Column(String(40), unique=True, index=True)
+    firstname = Column(String(50), nullable=False)
+    lastname = Column(String(50))
+    email = Column(String(40))
     phone = Column(String(50), index=True)
     birthdate = Column('birth', Date)
     otherinform = Column(String(150), nullable=True)
+    # derived lookup columns, written from phone and email by src.normalize.normalized_columns
+    phone_e164 = Column(String(16), nullable=True)
+    email_normalized = Column(String(40), nullable=True)
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
-    user = relationship('User', backref="contacts")
+    # never loaded implicitly: an accidental lazy load in an async route raises instead of querying
+    user = relationship('User', backref=backref("contacts", lazy="raise", passive_deletes=True), lazy="raise")
+
+    # every contact query is scoped by user_id, so it leads every index
+    __table_args__ = (
+        Index('ix_contacts_user_id_id', 'user_id', 'id'),
+        Index('ix_contacts_user_id_firstname', 'user_id', 'firstname'),
+        Index('ix_contacts_user_id_lastname', 'user_id', 'lastname'),
+        Index('ix_contacts_user_id_email', 'user_id', 'email', unique=True),
+        Index('ix_contacts_user_id_birth', 'user_id', 'birth'),
+        Index('ix_contacts_user_id_phone_e164', 'user_id', 'phone_e164'),
+        Index('ix_contacts_user_id_email_normalized', 'user_id', 'email_normalized'),
+        Index('ix_contacts_user_id_birth_month_day', 'user_id', extract('month', birthdate), extract('day', birthdate)),
+    )
+
+
+
+@event.listens_for(Contact, 'before_insert')
+@event.listens_for(Contact, 'before_update')
+def _normalize_contact(mapper, connection, contact):
+    # Core statements call normalized_columns, this covers contacts written through the ORM
+    contact.phone_e164 = normalize_phone(contact.phone)
+    contact.email_normalized = normalize_email(contact.email)
+
+
+# Full text search over the searchable contact columns, see src/search.py.
+# SQLite: FTS5 trigram shadow table kept in sync by triggers. Every row carries a user key of three
+# private-use characters, that is a single trigram unique to the owner, so MATCH can be scoped to one user.
+# Postgres: trigram and tsvector GIN indexes over the same concatenated document.
+CONTACT_SEARCH_COLUMNS = ('firstname', 'lastname', 'email', 'phone', 'otherinform')
+CONTACT_SEARCH_DOCUMENT = " || ' ' || ".join(f"coalesce({column}, '')" for column in CONTACT_SEARCH_COLUMNS)
+FTS_USER_KEY_BASE = 0xE000
+FTS_USER_KEY_DIGITS = 6400
+
+
+def fts_user_key(user_id: int) -> str:
+    """
+    The fts_user_key function returns the user key stored in contacts_fts for the user.
+    """
+    return ''.join(chr(FTS_USER_KEY_BASE + (user_id // FTS_USER_KEY_DIGITS ** power) % FTS_USER_KEY_DIGITS)
+                   for power in (2, 1, 0))
+
+
+def _fts_user_key_sql(user_id: str) -> str:
+    return 'char({})'.format(', '.join(
+        f'{FTS_USER_KEY_BASE} + ({user_id} / {FTS_USER_KEY_DIGITS ** power}) % {FTS_USER_KEY_DIGITS}'
+        for power in (2, 1, 0)))
+
+
+_fts_columns = ', '.join(('user_key',) + CONTACT_SEARCH_COLUMNS)
+_fts_new = ', '.join([_fts_user_key_sql('new.user_id')] + [f'new.{column}' for column in CONTACT_SEARCH_COLUMNS])
+_fts_old = ', '.join([_fts_user_key_sql('old.user_id')] + [f'old.{column}' for column in CONTACT_SEARCH_COLUMNS])
+
+CONTACT_SEARCH_DDL = {
+    'sqlite': [
+        f"CREATE VIEW IF NOT EXISTS contacts_fts_source AS SELECT id, {_fts_user_key_sql('user_id')} AS user_key, "
+        f"{', '.join(CONTACT_SEARCH_COLUMNS)} FROM contacts",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5({_fts_columns}, "
+        f"content='contacts_fts_source', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+        f"INSERT INTO contacts_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+        f"INSERT INTO contacts_fts(contacts_fts, rowid, {_fts_columns}) VALUES ('delete', old.id, {_fts_old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE OF user_id, {', '.join(CONTACT_SEARCH_COLUMNS)} "
+        f"ON contacts BEGIN "
+        f"INSERT INTO contacts_fts(contacts_fts, rowid, {_fts_columns}) VALUES ('delete', old.id, {_fts_old}); "
+        f"INSERT INTO contacts_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new}); END",
+    ],
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_contacts_search_trgm ON contacts USING gin (({CONTACT_SEARCH_DOCUMENT}) gin_trgm_ops)",
+        f"CREATE INDEX IF NOT EXISTS ix_contacts_search_tsv ON contacts "
+        f"USING gin (to_tsvector('simple', {CONTACT_SEARCH_DOCUMENT}))",
+    ],
+}
+
+for _dialect, _statements in CONTACT_SEARCH_DDL.items():
+    for _statement in _statements:
+        # DDL interpolates %, the modulo of the user key has to be escaped
+        event.listen(Contact.__table__, 'after_create', DDL(_statement.replace('%', '%%')).execute_if(dialect=_dialect))
+for _statement in ('DROP TABLE IF EXISTS contacts_fts', 'DROP VIEW IF EXISTS contacts_fts_source'):
+    event.listen(Contact.__table__, 'before_drop', DDL(_statement).execute_if(dialect='sqlite'))
 
 
 class User(Base):
@@ -28,8 +113,3 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
-  
-Base.metadata.create_all(bind=engine)
-
-
-    
\ No newline at end of file
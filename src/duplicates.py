@@ -0,0 +1,287 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import groupby
+from difflib import SequenceMatcher
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.contacts import CONTACT_COLUMNS, batch_update_statement
+from src.database.models import Contact
+from src.normalize import normalize_email, normalize_phone
+
+# share of the name in the similarity, the rest is the phone or email evidence
+NAME_WEIGHT = 0.5
+# ids per IN (...) when the contacts of the clusters are read
+READ_CHUNK = 1000
+
+# soundex digit of every latin letter, h and w are dropped
+_SOUNDEX_TABLE = str.maketrans("aeiouybfpvcgjkqsxzdtlmnr", "000000111122222222334556", "hw")
+_not_latin_re = re.compile(r"[^a-z]+")
+_non_word_re = re.compile(r"[\W\d_]+")
+
+
+def soundex(word: str) -> str | None:
+    """
+    The soundex function returns the American Soundex code of the latin letters of the word, e.g. R163 for Robert and Rupert.
+
+    :param word: str: a name
+    :return: str: four character code, None if the word has no latin letters
+    """
+    letters = _not_latin_re.sub("", word.lower())
+    if not letters:
+        return None
+    digits = letters.translate(_SOUNDEX_TABLE)
+    if letters[0] in "hw":
+        digits = "-" + digits
+    # letters with the same digit count once, also across h and w, and the first letter is kept as it is
+    digits = "".join(digit for digit, _ in groupby(digits))[1:].replace("0", "")
+    return (letters[0].upper() + digits[:3]).ljust(4, "0")
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(name: str | None) -> str | None:
+    """
+    The phonetic_key function returns the Soundex code of a name, or its first four letters for names
+    without latin letters, e.g. cyrillic ones.
+
+    :param name: str: first or last name
+    :return: str: key, None for an empty name
+    """
+    name = _non_word_re.sub("", (name or "").casefold())
+    if not name:
+        return None
+    return soundex(name) or name[:4]
+
+
+@dataclass(slots=True)
+class Candidate:
+    id: int
+    name: str
+    swapped: str
+    phone: str | None
+    email: str | None
+    phonetic: tuple[str, ...]
+
+
+def candidate(row) -> Candidate:
+    """
+    The candidate function normalizes the compared fields of a contact once.
+
+    :param row: contact with id, firstname, lastname, email and phone
+    :return: Candidate
+    """
+    first, last = (row.firstname or "").casefold().strip(), (row.lastname or "").casefold().strip()
+    phonetic = tuple(sorted(filter(None, (phonetic_key(row.firstname), phonetic_key(row.lastname)))))
+    return Candidate(row.id, f"{first} {last}", f"{last} {first}", normalize_phone(row.phone),
+                     normalize_email(row.email), phonetic)
+
+
+def blocking_keys(item: Candidate) -> list[tuple]:
+    """
+    The blocking_keys function returns the keys under which a contact is compared with others:
+    its phone in E.164, its lowercased email and the phonetic codes of its names in either order.
+    Only contacts sharing a key are ever compared.
+
+    :param item: Candidate: the contact
+    :return: list of keys
+    """
+    keys = []
+    if item.phone:
+        keys.append(("phone", item.phone))
+    if item.email:
+        keys.append(("email", item.email))
+    if item.phonetic:
+        keys.append(("name", *item.phonetic))
+    return keys
+
+
+def identifier_match(a: Candidate, b: Candidate) -> float:
+    """
+    The identifier_match function compares the phones and emails of two contacts: 1 if either is equal,
+    0 if some can be compared and none is equal, 0.5 if nothing can be compared.
+    """
+    compared = False
+    if a.phone and b.phone:
+        if a.phone == b.phone:
+            return 1.0
+        compared = True
+    if a.email and b.email:
+        if a.email == b.email:
+            return 1.0
+        compared = True
+    return 0.0 if compared else 0.5
+
+
+def similarity(a: Candidate, b: Candidate, floor: float = 0.0) -> float:
+    """
+    The similarity function scores how likely two contacts are the same person, from 0 to 1:
+    the edit similarity of the names in either order weighted by NAME_WEIGHT plus the identifier_match.
+    The name similarity is only computed when the score can reach floor, otherwise 0 is returned.
+    """
+    identifiers = (1 - NAME_WEIGHT) * identifier_match(a, b)
+    if NAME_WEIGHT + identifiers < floor:
+        return 0.0
+    matcher = SequenceMatcher(None, a.name, b.name)
+    name = matcher.ratio()
+    if name < 1.0 and a.swapped != a.name:
+        matcher.set_seq1(a.swapped)
+        name = max(name, matcher.ratio())
+    return NAME_WEIGHT * name + identifiers
+
+
+def duplicate_pairs(rows, threshold: float, window: int) -> dict[tuple[int, int], float]:
+    """
+    The duplicate_pairs function finds the pairs of contacts scoring at least threshold.
+    Contacts are grouped by blocking_keys; inside a block they are sorted by name and each is compared
+    with the next window ones only, so a huge block (a shared office phone) stays linear.
+
+    :param rows: contacts with id, firstname, lastname, email and phone
+    :param threshold: float: minimal similarity
+    :param window: int: neighbours compared inside a block
+    :return: score by pair of ids, the smaller id first
+    """
+    candidates = {}
+    blocks = {}
+    for row in rows:
+        item = candidates[row.id] = candidate(row)
+        for key in blocking_keys(item):
+            blocks.setdefault(key, []).append(row.id)
+    scores = {}
+    for key, ids in blocks.items():
+        if len(ids) < 2:
+            continue
+        members = sorted((candidates[contact_id] for contact_id in ids), key=lambda item: item.name)
+        if key[0] == "name" and threshold > NAME_WEIGHT:
+            # two contacts with a phone and an email each reach the threshold only by sharing one of them,
+            # and then the phone and email blocks compare them: by name only the others are compared
+            neighbours = ((members[i], members[max(0, i - window):i] + members[i + 1:i + 1 + window])
+                          for i, item in enumerate(members) if not (item.phone and item.email))
+        else:
+            neighbours = ((item, members[i + 1:i + 1 + window]) for i, item in enumerate(members))
+        for a, others in neighbours:
+            for b in others:
+                pair = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+                if pair not in scores:
+                    scores[pair] = similarity(a, b, threshold)
+    return {pair: score for pair, score in scores.items() if score >= threshold}
+
+
+def clusters(pairs: dict[tuple[int, int], float]) -> list[list[int]]:
+    """
+    The clusters function joins the pairs into groups of contacts connected by a chain of pairs.
+
+    :return: sorted ids of every group
+    """
+    parent = {}
+
+    def find(contact_id):
+        root = contact_id
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[contact_id] != root:
+            parent[contact_id], contact_id = root, parent[contact_id]
+        return root
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    groups = {}
+    for contact_id in parent:
+        groups.setdefault(find(contact_id), []).append(contact_id)
+    return [sorted(group) for group in groups.values()]
+
+
+async def find_duplicates(user_id: int, db: AsyncSession, threshold: float | None = None,
+                          limit: int = 100, window: int | None = None) -> list[dict]:
+    """
+    The find_duplicates function finds groups of the user's contacts that are probably the same person.
+    Only the compared columns are read, phones and emails from their normalized columns,
+    the full contacts are read for the returned groups only.
+
+    :param user_id: int: owner of the contacts
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param threshold: float: minimal similarity of a pair, settings.duplicates_threshold by default
+    :param limit: int: maximum number of groups
+    :param window: int: neighbours compared inside a block, see duplicate_pairs, settings.duplicates_window by default
+    :return: groups with the best pair score, the contacts and the scored pairs, most certain first
+    """
+    threshold = settings.duplicates_threshold if threshold is None else threshold
+    window = settings.duplicates_window if window is None else window
+    rows = await db.execute(select(Contact.id, Contact.firstname, Contact.lastname,
+                                   Contact.email_normalized.label("email"), Contact.phone_e164.label("phone"))
+                            .where(Contact.user_id == user_id))
+    pairs = duplicate_pairs(rows.all(), threshold, window)
+    groups = [{"ids": ids, "pairs": []} for ids in clusters(pairs)]
+    group_of = {contact_id: group for group in groups for contact_id in group["ids"]}
+    for pair, score in pairs.items():
+        group_of[pair[0]]["pairs"].append({"ids": pair, "score": round(score, 3)})
+    for group in groups:
+        group["score"] = max(pair["score"] for pair in group["pairs"])
+    groups.sort(key=lambda group: (-group["score"], group["ids"][0]))
+    groups = groups[:limit]
+
+    ids = [contact_id for group in groups for contact_id in group["ids"]]
+    contacts = {}
+    for start in range(0, len(ids), READ_CHUNK):
+        result = await db.execute(select(*CONTACT_COLUMNS)
+                                  .where(Contact.user_id == user_id, Contact.id.in_(ids[start:start + READ_CHUNK])))
+        contacts.update((row.id, row._asdict()) for row in result.all())
+    return [{"score": group["score"], "contacts": [contacts[contact_id] for contact_id in group.pop("ids")],
+             "pairs": group["pairs"]} for group in groups]
+
+
+def merged_values(primary: dict, duplicates: list[dict]) -> dict:
+    """
+    The merged_values function combines a contact with its duplicates: the fields of the primary contact win,
+    empty ones are filled from the duplicates in the given order and the notes of all are joined.
+
+    :param primary: dict: contact that is kept
+    :param duplicates: list[dict]: contacts merged into it
+    :return: changed fields of the primary contact
+    """
+    values = {}
+    for name in ("firstname", "lastname", "email", "phone", "birthdate"):
+        if not primary[name]:
+            value = next((duplicate[name] for duplicate in duplicates if duplicate[name]), None)
+            if value:
+                values[name] = value
+    notes = []
+    for contact in [primary, *duplicates]:
+        note = (contact["otherinform"] or "").strip()
+        if note and note not in notes:
+            notes.append(note)
+    otherinform = "; ".join(notes)[:Contact.otherinform.type.length]
+    if otherinform != (primary["otherinform"] or ""):
+        values["otherinform"] = otherinform
+    return values
+
+
+async def merge_contacts(user_id: int, merges: dict[int, list[int]], db: AsyncSession) -> list[dict] | None:
+    """
+    The merge_contacts function merges groups of duplicates of the user in one transaction:
+    the duplicates are deleted with one DELETE and the kept contacts updated with one UPDATE.
+
+    :param user_id: int: owner of the contacts
+    :param merges: dict[int, list[int]]: ids of the duplicates by id of the contact that is kept
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: the kept contacts in the order of merges, None if the user does not own one of the ids (nothing changed)
+    :raises IntegrityError: a filled email is already used by another contact of the user
+    """
+    duplicate_ids = [contact_id for duplicates in merges.values() for contact_id in duplicates]
+    ids = [*merges, *duplicate_ids]
+    result = await db.execute(select(*CONTACT_COLUMNS).where(Contact.user_id == user_id, Contact.id.in_(ids)))
+    contacts = {row.id: row._asdict() for row in result.all()}
+    if len(contacts) != len(ids):
+        return None
+    patches = {primary: merged_values(contacts[primary], [contacts[contact_id] for contact_id in duplicates])
+               for primary, duplicates in merges.items()}
+    patches = {primary: values for primary, values in patches.items() if values}
+    await db.execute(delete(Contact).where(Contact.user_id == user_id, Contact.id.in_(duplicate_ids))
+                     .execution_options(synchronize_session=False))
+    if patches:
+        result = await db.execute(batch_update_statement(user_id, patches))
+        contacts.update((row.id, row._asdict()) for row in result.all())
+    await db.commit()
+    return [contacts[primary] for primary in merges]
@@ -1,46 +1,152 @@
+import logging
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
-from pydantic import EmailStr
+from redis.exceptions import RedisError
 
 from src.auth_services import auth_service
+from src.email_queue import email_queue
 
 from src.conf.config import settings
 
+logger = logging.getLogger(__name__)
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=EmailStr(settings.mail_from),
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Desired Name",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+# fastapi-mail and jinja2 take a good part of the app's import time and the web process only queues letters,
+# so they are imported when a letter is actually built
+if TYPE_CHECKING:
+    from fastapi_mail import ConnectionConfig, MessageSchema
+    from jinja2 import Environment, Template
+
+
+@lru_cache(maxsize=None)
+def get_conf() -> "ConnectionConfig":
+    """
+    The mail connection config, built on first use.
+    """
+    from fastapi_mail import ConnectionConfig
+
+    return ConnectionConfig(
+        MAIL_USERNAME=settings.mail_username,
+        MAIL_PASSWORD=settings.mail_password,
+        MAIL_FROM=settings.mail_from,
+        MAIL_PORT=settings.mail_port,
+        MAIL_SERVER=settings.mail_server,
+        MAIL_FROM_NAME="Desired Name",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True,
+        TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
+    )
+
+
+def configure_queue() -> None:
+    """
+    Apply the email_* settings to the shared email_queue, on startup of the app and of the worker.
+    """
+    email_queue.dedupe_ttl = settings.email_dedupe_ttl
+    email_queue.max_attempts = settings.email_max_attempts
+    email_queue.backoff = settings.email_retry_backoff
+
+
+@lru_cache(maxsize=None)
+def template_environment(folder: Path) -> "Environment":
+    """
+    One Jinja environment per template folder, shared by every letter.
+    Templates are compiled on first use and never checked on disk again.
+
+    :param folder: Path: template folder
+    :return: Environment: the shared environment
+    """
+    from jinja2 import Environment, FileSystemLoader
+
+    return Environment(loader=FileSystemLoader(folder), auto_reload=False)
+
+
+def get_template(name: str = "email_template.html", config: "ConnectionConfig | None" = None) -> "Template":
+    """
+    Get the compiled template. Call it at startup to compile the template before the first letter.
+
+    :param name: str: template file name
+    :param config: ConnectionConfig: config with the template folder, get_conf() by default
+    :return: Template: the compiled template
+    """
+    config = config or get_conf()
+    return template_environment(Path(config.TEMPLATE_FOLDER)).get_template(name)
+
+
+def render_confirmations(recipients: Iterable[str], host: str, config: "ConnectionConfig | None" = None) -> list[str]:
+    """
+    Render confirmation letters for many recipients at once, e.g. to resend them after an outage.
+
+    :param recipients: Iterable[str]: user emails
+    :param host: str: host
+    :param config: ConnectionConfig: config with the template folder, get_conf() by default
+    :return: list[str]: html bodies in the order of recipients
+    """
+    template = get_template(config=config)
+    host = str(host)
+    return [template.render(host=host, email=email, token=auth_service.create_email_token({"sub": email}))
+            for email in recipients]
+
+
+def confirmation_message(email: str, host: str, config: "ConnectionConfig | None" = None) -> "MessageSchema":
+    """
+    Build the confirmation letter with a fresh verification token.
+
+    :param email: str: user email
+    :param host: str: host
+    :param config: ConnectionConfig: config with the template folder, get_conf() by default
+    :return: MessageSchema: the letter with the rendered email_template.html
+    """
+    from fastapi_mail import MessageSchema, MessageType
+
+    body, = render_confirmations([email], host, config)
+    return MessageSchema(
+        subject="Confirm your email ",
+        recipients=[email],
+        body=body,
+        subtype=MessageType.html
+    )
+
+
+async def build_message(email: str, host: str, config: "ConnectionConfig | None" = None):
+    """
+    Render the confirmation letter into a MIME message ready for SMTP.
+
+    :param email: str: user email
+    :param host: str: host
+    :param config: ConnectionConfig: sender and template folder, get_conf() by default
+    :return: the MIME message
+    """
+    from fastapi_mail.msg import MailMsg
+
+    config = config or get_conf()
+    message = confirmation_message(email, host, config)
+    sender = f"{config.MAIL_FROM_NAME} <{config.MAIL_FROM}>" if config.MAIL_FROM_NAME else config.MAIL_FROM
+    return await MailMsg(message)._message(sender)
 
 
 async def send_email(email: str, host: str):
     """
-    This function send a letter with verification token on the user email.
+    This function queues a letter with verification token for the user email.
+    The email worker (python -m src.email_worker) delivers it. If Redis is unavailable the letter
+    is sent right away instead.
+
     :param email: str: user email
     :param host: str: host
     """
     try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "email": email,"token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+        await email_queue.enqueue(email, str(host))
+        return
+    except RedisError:
+        logger.exception("queueing the confirmation email to %s failed, sending it right away", email)
+    from fastapi_mail import FastMail
+    from fastapi_mail.errors import ConnectionErrors
 
+    try:
+        fm = FastMail(get_conf())
+        await fm.send_message(confirmation_message(email, host))
+    except ConnectionErrors:
+        logger.exception("confirmation email to %s failed", email)
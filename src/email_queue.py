@@ -0,0 +1,174 @@
+import json
+import time
+import uuid
+
+from redis.exceptions import RedisError
+
+
+class EmailQueue:
+    """
+    Redis list of outbound emails consumed by the email worker (src.email_worker).
+    Every worker reserves jobs into its own processing list and only removes them once sent, so a crashed
+    worker loses nothing. A running worker refreshes its heartbeat key; the processing lists of workers
+    whose heartbeat expired are put back on the queue by the others, so any number of workers can run.
+    Failed jobs wait in a sorted set scored by their next attempt time and end up
+    in a dead letter list after max_attempts. Repeated requests for the same address are deduped.
+    """
+
+    QUEUE = "email:queue"
+    RETRY = "email:retry"
+    DEAD = "email:dead"
+    WORKERS = "email:workers"
+
+    def __init__(self, redis_client=None, dedupe_ttl: int = 600, max_attempts: int = 5, backoff: float = 30.0,
+                 heartbeat_ttl: int = 300):
+        self.redis = redis_client
+        self.dedupe_ttl = dedupe_ttl
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        # longer than any batch can take to send, a worker that misses it is taken for dead
+        self.heartbeat_ttl = heartbeat_ttl
+        self.worker_id = uuid.uuid4().hex
+
+    def bind(self, redis_client) -> None:
+        """
+        Attach the Redis client.
+        """
+        self.redis = redis_client
+
+    @staticmethod
+    def dedupe_key(email: str) -> str:
+        return f"email:dedupe:{email}"
+
+    @staticmethod
+    def processing_key(worker_id: str) -> str:
+        return f"email:processing:{worker_id}"
+
+    @staticmethod
+    def heartbeat_key(worker_id: str) -> str:
+        return f"email:worker:{worker_id}"
+
+    @property
+    def processing(self) -> str:
+        """
+        The processing list of this worker.
+        """
+        return self.processing_key(self.worker_id)
+
+    async def enqueue(self, email: str, host: str) -> bool:
+        """
+        Put a confirmation email on the queue unless one was queued for the address within dedupe_ttl.
+
+        :param email: str: recipient
+        :param host: str: base url for the confirmation link
+        :return: True if queued, False if it is a duplicate
+        """
+        if self.redis is None:
+            raise RedisError("The email queue is not bound to Redis")
+        job = json.dumps({"email": email, "host": host, "attempts": 0})
+        if not await self.redis.set(self.dedupe_key(email), 1, nx=True, ex=self.dedupe_ttl):
+            return False
+        try:
+            await self.redis.rpush(self.QUEUE, job)
+        except RedisError:
+            await self.redis.delete(self.dedupe_key(email))
+            raise
+        return True
+
+    async def reserve(self, batch_size: int, timeout: float = 1.0) -> list[bytes]:
+        """
+        Move up to batch_size jobs to the processing list, waiting up to timeout seconds for the first one.
+
+        :return: raw jobs, pass them to ack or retry when done
+        """
+        first = await self.redis.blmove(self.QUEUE, self.processing, timeout, "LEFT", "RIGHT")
+        if first is None:
+            return []
+        batch = [first]
+        if batch_size > 1:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for _ in range(batch_size - 1):
+                    pipe.lmove(self.QUEUE, self.processing, "LEFT", "RIGHT")
+                batch.extend(raw for raw in await pipe.execute() if raw is not None)
+        return batch
+
+    async def ack(self, raw: bytes) -> None:
+        await self.redis.lrem(self.processing, 1, raw)
+
+    async def retry(self, raw: bytes, permanent: bool = False) -> bool:
+        """
+        Schedule a failed job again with exponential backoff, or move it to the dead letter list
+        when it is permanent or out of attempts.
+
+        :return: True if the job will be retried
+        """
+        job = json.loads(raw)
+        job["attempts"] += 1
+        again = not permanent and job["attempts"] < self.max_attempts
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if again:
+                due = time.time() + self.backoff * 2 ** (job["attempts"] - 1)
+                pipe.zadd(self.RETRY, {json.dumps(job): due})
+            else:
+                pipe.rpush(self.DEAD, json.dumps(job))
+            pipe.lrem(self.processing, 1, raw)
+            await pipe.execute()
+        return again
+
+    async def promote_due(self) -> int:
+        """
+        Move the retries whose backoff has passed back to the queue.
+
+        :return: number of jobs moved
+        """
+        due = await self.redis.zrangebyscore(self.RETRY, "-inf", time.time())
+        if not due:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for raw in due:
+                pipe.zrem(self.RETRY, raw)
+            removed = await pipe.execute()
+        # zrem succeeds for one worker only, so a job is never queued twice
+        moved = [raw for raw, ok in zip(due, removed) if ok]
+        if moved:
+            await self.redis.rpush(self.QUEUE, *moved)
+        return len(moved)
+
+    async def heartbeat(self) -> None:
+        """
+        Register this worker and mark it alive for heartbeat_ttl seconds. Call it well within that time.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(self.WORKERS, self.worker_id)
+            pipe.set(self.heartbeat_key(self.worker_id), 1, ex=self.heartbeat_ttl)
+            await pipe.execute()
+
+    async def recover(self) -> int:
+        """
+        Put back the jobs of workers whose heartbeat expired, they stopped without finishing them.
+        Jobs reserved by running workers are left alone.
+
+        :return: number of jobs moved
+        """
+        moved = 0
+        for worker_id in await self.redis.smembers(self.WORKERS):
+            worker_id = worker_id.decode()
+            if worker_id == self.worker_id or await self.redis.exists(self.heartbeat_key(worker_id)):
+                continue
+            # lmove hands every job to one caller only, also when several workers recover at once
+            while await self.redis.lmove(self.processing_key(worker_id), self.QUEUE, "RIGHT", "LEFT") is not None:
+                moved += 1
+            await self.redis.srem(self.WORKERS, worker_id)
+        return moved
+
+    async def retire(self) -> None:
+        """
+        Unregister this worker on a clean stop, when none of its jobs is in flight.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.srem(self.WORKERS, self.worker_id)
+            pipe.delete(self.heartbeat_key(self.worker_id))
+            await pipe.execute()
+
+
+email_queue = EmailQueue()
@@ -0,0 +1,163 @@
+"""
+Email worker: delivers the letters queued by src.email.send_email.
+
+Run it next to the web app with ``python -m src.email_worker``. One worker process per queue is enough,
+it sends a batch concurrently over a small pool of SMTP connections that stay open between batches.
+More workers can run side by side: each reserves into its own processing list, and only the jobs of
+a worker whose heartbeat expired are put back on the queue.
+"""
+import asyncio
+import json
+import logging
+import signal
+import time
+from contextlib import asynccontextmanager
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from prometheus_client import start_http_server
+
+from src.email_queue import EmailQueue
+from src.metrics import EMAIL_LATENCY, EMAILS
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPool:
+    """
+    Up to size logged-in SMTP connections reused across messages.
+    A connection that fails while sending is closed and replaced on the next acquire.
+    """
+
+    def __init__(self, config: ConnectionConfig, size: int = 2):
+        self.config = config
+        self.size = size
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.connects = 0
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            timeout=self.config.TIMEOUT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD)
+        self.connects += 1
+        return smtp
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._slots:
+            smtp = self._idle.pop() if self._idle else None
+            if smtp is None or not smtp.is_connected:
+                smtp = await self._connect()
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+            self._idle.append(smtp)
+
+    async def close(self) -> None:
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                smtp.close()
+
+
+class EmailWorker:
+    """
+    Reserves batches from the EmailQueue, sends them and acks or reschedules every job.
+    """
+
+    def __init__(self, queue: EmailQueue, pool: SMTPPool, build_message, batch_size: int = 50,
+                 poll_timeout: float = 1.0):
+        self.queue = queue
+        self.pool = pool
+        self.build_message = build_message
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
+        self.sent = 0
+        self.failed = 0
+        self._next_heartbeat = 0.0
+
+    async def send(self, raw: bytes) -> None:
+        job = json.loads(raw)
+        try:
+            message = await self.build_message(job["email"], job["host"], self.pool.config)
+            with EMAIL_LATENCY.time():
+                async with self.pool.acquire() as smtp:
+                    await smtp.send_message(message)
+        except Exception as err:
+            self.failed += 1
+            EMAILS.labels("failed").inc()
+            # refused recipients and broken letters will not get better on retry
+            permanent = (isinstance(err, aiosmtplib.SMTPRecipientsRefused)
+                         or not isinstance(err, (aiosmtplib.SMTPException, OSError)))
+            retried = await self.queue.retry(raw, permanent=permanent)
+            logger.warning("email to %s failed (%s), %s", job["email"], err, "retrying" if retried else "dropped")
+            return
+        await self.queue.ack(raw)
+        self.sent += 1
+        EMAILS.labels("sent").inc()
+
+    async def run_once(self) -> int:
+        """
+        Refresh the heartbeat, promote due retries and send one batch.
+        With every heartbeat the jobs of workers that died are put back on the queue.
+
+        :return: size of the batch
+        """
+        if time.monotonic() >= self._next_heartbeat:
+            self._next_heartbeat = time.monotonic() + self.queue.heartbeat_ttl / 3
+            await self.queue.heartbeat()
+            await self.queue.recover()
+        await self.queue.promote_due()
+        batch = await self.queue.reserve(self.batch_size, self.poll_timeout)
+        await asyncio.gather(*(self.send(raw) for raw in batch))
+        return len(batch)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        try:
+            while not stop.is_set():
+                await self.run_once()
+        finally:
+            await self.pool.close()
+        await self.queue.retire()
+
+
+async def main() -> None:
+    from src.conf.config import settings
+    from src.email import build_message, configure_queue, email_queue, get_conf, get_template
+    from src.redis_pool import redis_pool
+
+    conf = get_conf()
+    get_template(config=conf)
+    configure_queue()
+    email_queue.bind(redis_pool.open())
+    if settings.email_worker_metrics_port:
+        start_http_server(settings.email_worker_metrics_port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    worker = EmailWorker(email_queue, SMTPPool(conf, settings.email_smtp_pool_size), build_message,
+                         settings.email_batch_size)
+    try:
+        await worker.run(stop)
+    finally:
+        await redis_pool.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+
+class PasswordHasher:
+    """
+    Runs CryptContext hashing and verification on a bounded thread pool instead of the event loop.
+    bcrypt releases the GIL, so the pool hashes on as many cores as it has workers while the loop keeps serving.
+    When more than workers + max_queue calls are pending new ones are rejected with 503.
+    """
+
+    def __init__(self, context: CryptContext, workers: int = 0, max_queue: int = 64):
+        self.context = context
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor = None
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hasher")
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many concurrent logins, try again later", headers={"Retry-After": "1"})
+        self.pending += 1
+        queued = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return started, func(*args)
+            finally:
+                self.run_seconds += time.perf_counter() - started
+
+        try:
+            started, result = await asyncio.get_running_loop().run_in_executor(self.executor, timed)
+        finally:
+            self.pending -= 1
+        self.calls += 1
+        self.wait_seconds += started - queued
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """
+        Verify the password and return a new hash if the stored one uses a deprecated scheme or settings.
+        """
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "wait_seconds_total": round(self.wait_seconds, 6),
+            "run_seconds_total": round(self.run_seconds, 6),
+        }
@@ -0,0 +1,206 @@
+import contextvars
+import cProfile
+import io
+import pstats
+import time
+import uuid
+from pathlib import Path
+
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency", ["method", "route"])
+REQUESTS = Counter("http_requests_total", "Finished requests", ["method", "route", "status"])
+IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being served", ["method"])
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements per request", ["route"],
+                            buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100))
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement latency",
+                          buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+REDIS_LATENCY = Histogram("redis_command_duration_seconds", "Redis command latency", ["command"],
+                          buckets=(.0002, .0005, .001, .0025, .005, .01, .025, .05, .1, .5))
+REDIS_ERRORS = Counter("redis_command_errors_total", "Failed Redis commands", ["command"])
+EMAIL_LATENCY = Histogram("email_send_duration_seconds", "Time to hand one letter to the SMTP server")
+EMAILS = Counter("emails_total", "Letters processed by the email worker", ["result"])
+
+# statements and their time for the request being served, None outside requests
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    QUERY_LATENCY.observe(elapsed)
+    stats = _request_queries.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def instrument_engine(engine) -> None:
+    """
+    Time every statement of the engine and count them per request.
+
+    :param engine: Engine | AsyncEngine
+    """
+    engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Redis client that records the latency of every command. Pipelines are timed as one PIPELINE command.
+    """
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except redis.RedisError:
+            REDIS_ERRORS.labels(command).inc()
+            raise
+        finally:
+            REDIS_LATENCY.labels(command).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedPipeline(Pipeline):
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_LATENCY.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class StatsCollector:
+    """
+    Exposes a dict of numbers returned by a function at scrape time, e.g. pool_stats or the hasher metrics.
+    Keys ending in _total become counters, the other numeric keys gauges.
+    """
+
+    def __init__(self, prefix: str, stats):
+        self.prefix = prefix
+        self.stats = stats
+
+    def describe(self):
+        # stops the registry from calling collect() on register, stats() may create what it reports on
+        return []
+
+    def collect(self):
+        for key, value in self.stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key.endswith("_total"):
+                yield CounterMetricFamily(f"{self.prefix}_{key[:-len('_total')]}", key, value=value)
+            else:
+                yield GaugeMetricFamily(f"{self.prefix}_{key}", key, value=value)
+
+
+_stats_collectors = {}
+
+
+def register_stats(prefix: str, stats) -> None:
+    """
+    Publish the numbers returned by stats() under prefix on /metrics.
+    Registering the prefix again replaces its stats function.
+
+    :param prefix: str: metric name prefix
+    :param stats: callable returning a dict
+    """
+    if prefix in _stats_collectors:
+        _stats_collectors[prefix].stats = stats
+        return
+    _stats_collectors[prefix] = StatsCollector(prefix, stats)
+    REGISTRY.register(_stats_collectors[prefix])
+
+
+def metrics_response() -> tuple[bytes, str]:
+    """
+    :return: the Prometheus text exposition of all metrics and its content type
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, in-flight requests and SQL statements per request.
+
+    With profile_dir set, a request sent with the X-Profile header is profiled (pyinstrument if installed,
+    cProfile otherwise). The report is written to profile_dir and its file name returned in X-Profile-Report.
+    cProfile sees everything the event loop runs meanwhile but not sync endpoints run in the threadpool,
+    so profile on an otherwise idle instance.
+    """
+
+    def __init__(self, app, profile_dir: str | None = None):
+        self.app = app
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        status = [500]
+        report = None
+        if self.profile_dir is not None and any(name == b"x-profile" for name, _ in scope["headers"]):
+            report = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            report += ".html" if Profiler is not None else ".txt"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if report is not None:
+                    message.setdefault("headers", []).append((b"x-profile-report", report.encode()))
+            await send(message)
+
+        stats = [0, 0.0]
+        token = _request_queries.set(stats)
+        IN_PROGRESS.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            if report is None:
+                await self.app(scope, receive, send_wrapper)
+            else:
+                await self._profiled(report, scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.labels(method).dec()
+            _request_queries.reset(token)
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            REQUESTS.labels(method, route, str(status[0])).inc()
+            REQUEST_QUERIES.labels(route).observe(stats[0])
+
+    async def _profiled(self, report: str, scope, receive, send):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        if Profiler is not None:
+            profiler = Profiler(async_mode="enabled")
+            with profiler:
+                await self.app(scope, receive, send)
+            (self.profile_dir / report).write_text(profiler.output_html())
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(50)
+            (self.profile_dir / report).write_text(out.getvalue())
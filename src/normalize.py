@@ -0,0 +1,65 @@
+import re
+
+from src.conf.config import settings
+
+# E.164: a country code and a subscriber number, at most 15 digits
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+# national numbers written without the country code, shorter or longer ones are not phones of the default country
+NATIONAL_MIN_DIGITS = 9
+NATIONAL_MAX_DIGITS = 10
+
+_non_digit_re = re.compile(r"\D+")
+
+
+def normalize_phone(phone: str | None, country_code: str | None = None) -> str | None:
+    """
+    The normalize_phone function converts a phone as typed by the user to E.164, e.g. +380501112233.
+    A number with + or 00 is international, a national number with the trunk 0 or without it
+    gets the default country code if it has NATIONAL_MIN_DIGITS to NATIONAL_MAX_DIGITS digits.
+
+    :param phone: str: phone in any formatting
+    :param country_code: str: country code of national numbers, settings.phone_default_country_code by default
+    :return: str: the phone in E.164, None if it cannot be one
+    """
+    phone = (phone or "").strip()
+    digits = _non_digit_re.sub("", phone)
+    if not phone.startswith("+"):
+        country_code = country_code or settings.phone_default_country_code
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0") or (len(digits) <= NATIONAL_MAX_DIGITS and not digits.startswith(country_code)):
+            national = digits.removeprefix("0")
+            if not NATIONAL_MIN_DIGITS <= len(national) <= NATIONAL_MAX_DIGITS:
+                return None
+            digits = country_code + national
+    if not E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return None
+    return f"+{digits}"
+
+
+def normalize_email(email: str | None) -> str | None:
+    """
+    The normalize_email function trims and lowercases the email.
+
+    :param email: str: email as typed by the user
+    :return: str: normalized email, None if empty
+    """
+    return (email or "").strip().lower() or None
+
+
+def normalized_columns(values: dict) -> dict:
+    """
+    The normalized_columns function adds the derived lookup columns to the values written to a contact:
+    phone_e164 for phone and email_normalized for email. Every INSERT and UPDATE of contacts goes through it,
+    ORM flushes through the mapper events of Contact.
+
+    :param values: dict: columns of the contact to write
+    :return: dict: the values with the derived columns of the given ones
+    """
+    values = dict(values)
+    if "phone" in values:
+        values["phone_e164"] = normalize_phone(values["phone"])
+    if "email" in values:
+        values["email_normalized"] = normalize_email(values["email"])
+    return values
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import math
+import time
+
+from fastapi import Depends, HTTPException, Response, status
+from redis.exceptions import RedisError
+
+from src.auth_services import auth_service
+from src.conf.config import settings
+from src.user_cache import AuthPrincipal
+
+logger = logging.getLogger(__name__)
+
+
+def parse_limit(limit: str) -> tuple[int, int]:
+    """
+    Parse a limit written as "times/seconds", e.g. "10/60".
+
+    :param limit: str: the limit
+    :return: tuple[int, int]: allowed requests and the window in seconds
+    """
+    times, seconds = limit.split("/")
+    return int(times), int(seconds)
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding window rate limiter with a local tier.
+
+    Every process counts hits per key and fixed window in memory and decides locally, so a request
+    never waits for Redis. The rate is the count of the current window plus the previous one weighted
+    by how much of it still overlaps the sliding window. In the background the local increments are
+    pushed to Redis in one pipeline every sync_interval seconds, and the totals Redis returns replace
+    the local view, so the limit holds across processes within one sync interval.
+    While Redis is down the limits are enforced per process only.
+    """
+
+    def __init__(self, redis_client=None, sync_interval: float = 1.0, failure_backoff: float = 5.0):
+        self.redis = redis_client
+        self.sync_interval = sync_interval
+        self.failure_backoff = failure_backoff
+        # (key, seconds) -> {window index: [count known to all processes, local hits not synced yet]}
+        self._counts = {}
+        self._next_sync = 0.0
+        self._task = None
+
+    def bind(self, redis_client) -> None:
+        """
+        Attach the Redis client used to share the counts.
+        """
+        self.redis = redis_client
+
+    @staticmethod
+    def key(key: str, window: int) -> str:
+        return f"ratelimit:{key}:{window}"
+
+    def hit(self, key: str, times: int, seconds: int, now: float | None = None) -> float:
+        """
+        Count a request against the limit.
+
+        :param key: str: what is limited, e.g. route and user
+        :param times: int: allowed requests per window
+        :param seconds: int: length of the window
+        :param now: float: unix time, time.time() by default
+        :return: float: 0 if the request is allowed, otherwise seconds until it would be
+        """
+        now = time.time() if now is None else now
+        window, offset = divmod(now, seconds)
+        window = int(window)
+        windows = self._counts.setdefault((key, seconds), {})
+        current = windows.get(window)
+        if current is None:
+            # older windows no longer count, drop them here as sync() never runs without Redis
+            for old in [old for old in windows if old < window - 1]:
+                del windows[old]
+            current = windows[window] = [0, 0]
+        previous = windows.get(window - 1, (0, 0))
+        weight = 1 - offset / seconds
+        rate = sum(previous) * weight + sum(current)
+        self._maybe_sync()
+        if rate + 1 > times:
+            if sum(current) + 1 > times:
+                return seconds - offset
+            # the previous window has to slide out far enough to make room for one more request
+            needed = (rate + 1 - times) / sum(previous) * seconds
+            return max(needed, 0.001)
+        current[1] += 1
+        return 0.0
+
+    def _maybe_sync(self) -> None:
+        if self.redis is None or (self._task is not None and not self._task.done()):
+            return
+        if time.monotonic() < self._next_sync:
+            return
+        self._next_sync = time.monotonic() + self.sync_interval
+        self._task = asyncio.get_running_loop().create_task(self.sync())
+
+    async def sync(self, now: float | None = None) -> bool:
+        """
+        Push the local hits to Redis and take over the totals of all processes.
+        Windows older than the previous one are dropped.
+
+        :return: bool: False if Redis failed, the hits are kept and pushed with the next sync
+        """
+        now = time.time() if now is None else now
+        batch = []
+        for (key, seconds), windows in list(self._counts.items()):
+            current = int(now // seconds)
+            for window in [window for window in windows if window < current - 1]:
+                del windows[window]
+            if not windows:
+                del self._counts[key, seconds]
+                continue
+            for window, counts in windows.items():
+                batch.append((key, seconds, window, counts, counts[1]))
+                # optimistic: the hits now count as shared, rolled back if Redis fails
+                counts[0] += counts[1]
+                counts[1] = 0
+        if not batch or self.redis is None:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, seconds, window, _, sent in batch:
+                    pipe.incrby(self.key(key, window), sent)
+                    pipe.expire(self.key(key, window), seconds * 2)
+                totals = (await pipe.execute())[::2]
+        except RedisError as err:
+            logger.warning("rate limit sync failed, limiting per process: %s", err)
+            for *_, counts, sent in batch:
+                counts[0] -= sent
+                counts[1] += sent
+            self._next_sync = time.monotonic() + self.failure_backoff
+            return False
+        for (*_, counts, _), total in zip(batch, totals):
+            # hits counted while the pipeline was in flight stay local
+            counts[0] = int(total)
+        return True
+
+    async def close(self) -> None:
+        """
+        Wait for a running sync and push what is left. Call on shutdown.
+        """
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.sync()
+
+
+rate_limiter = SlidingWindowLimiter()
+
+
+class RateLimit:
+    """
+    Route dependency limiting every user to times requests per seconds, counted by rate_limiter.
+    The limit can be overridden per route name with settings.rate_limits, e.g. {"read_contacts": "10/60"}.
+    Rejected requests get 429 with Retry-After, allowed ones the X-RateLimit-Limit header.
+    """
+
+    def __init__(self, name: str, times: int, seconds: int, limiter: SlidingWindowLimiter = rate_limiter):
+        self.name = name
+        self.times = times
+        self.seconds = seconds
+        self.limiter = limiter
+
+    def limit(self) -> tuple[int, int]:
+        override = settings.rate_limits.get(self.name)
+        return parse_limit(override) if override else (self.times, self.seconds)
+
+    async def __call__(self, response: Response, current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
+        if not settings.rate_limit_enabled:
+            return
+        times, seconds = self.limit()
+        retry_after = self.limiter.hit(f"{self.name}:{current_user.id}", times, seconds)
+        if retry_after:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+        response.headers["X-RateLimit-Limit"] = f"{times}/{seconds}"
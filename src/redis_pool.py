@@ -0,0 +1,48 @@
+import redis.asyncio as redis
+
+from src.conf.config import settings
+from src.metrics import InstrumentedRedis
+
+
+class RedisPool:
+    """
+    The one Redis connection pool of a process, shared by the rate limiter, auth, the caches and the queues.
+    The pool blocks up to redis_pool_timeout seconds for a free connection instead of opening unbounded ones,
+    and idle connections are pinged every redis_health_check_interval seconds before reuse.
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.client = None
+
+    def open(self) -> InstrumentedRedis:
+        """
+        Create the pool and the client on first call, return the client.
+        """
+        if self.client is None:
+            self.pool = redis.BlockingConnectionPool(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=0,
+                max_connections=settings.redis_max_connections,
+                timeout=settings.redis_pool_timeout,
+                socket_timeout=settings.redis_socket_timeout,
+                socket_connect_timeout=settings.redis_connect_timeout,
+                health_check_interval=settings.redis_health_check_interval,
+                retry_on_timeout=True,
+            )
+            self.client = InstrumentedRedis(connection_pool=self.pool)
+        return self.client
+
+    async def close(self) -> None:
+        """
+        Disconnect every connection of the pool. The client holds no connection of its own.
+        """
+        if self.pool is not None:
+            await self.pool.disconnect()
+        self.pool = None
+        self.client = None
+
+
+redis_pool = RedisPool()
+
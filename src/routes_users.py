@@ -1,39 +1,44 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
-
-from src.database.db import get_db
-from src.database.models import User
-import users as repository_users
+import asyncio
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File
+
+from src.avatars import avatar_status, resize_avatar, store_avatar
+from src.user_cache import AuthPrincipal
 from src.auth_services import auth_service
 from src.conf.config import settings
-from src.schemas import UserDb
+from src.schemas import UserDb, AvatarStatusResponse
 
 router_users = APIRouter(prefix="/users", tags=["users"])
 
 
 @router_users.get("/me/", response_model=UserDb)
-async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
+async def read_users_me(current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
     return current_user
 
 
-@router_users.patch('/avatar', response_model=UserDb)
-async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+@router_users.patch('/avatar', response_model=AvatarStatusResponse, status_code=status.HTTP_202_ACCEPTED)
+async def update_avatar_user(background_tasks: BackgroundTasks, file: UploadFile = File(),
+                             current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
+    """
+    The function resizes the image to a square avatar and uploads it in the background.
+    The resizing runs in a thread and the upload after the response, so the event loop is never blocked.
+    :return: pending status, poll GET /users/avatar for the result
+    """
+    data = await file.read(settings.avatar_max_bytes + 1)
+    if len(data) > settings.avatar_max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+    try:
+        image = await asyncio.to_thread(resize_avatar, data, settings.avatar_size)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(err))
+    background_tasks.add_task(store_avatar, current_user.email, image)
+    return await avatar_status.set(current_user.email, "pending")
+
+
+@router_users.get('/avatar', response_model=AvatarStatusResponse)
+async def read_avatar_status(current_user: AuthPrincipal = Depends(auth_service.get_current_user)):
     """
-    The upload_image function takes a file, uploads it to Cloudinary and returns the URL of the uploaded image.
-    :return: user contact after update
+    The function returns the state of the last avatar upload.
+    :return: pending, failed with the reason, or done with the avatar url
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'Contacts/{current_user.email}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'Contacts/{current_user.email}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
-    return user
\ No newline at end of file
+    return await avatar_status.get(current_user.email) or {"status": "done", "avatar": current_user.avatar}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter
 from datetime import date
+from typing import Optional
 
 
 class ContactBase(BaseModel):
@@ -15,9 +16,45 @@ class ContactUpdate(ContactBase):
     phone: str
 
 class ContactResponse(ContactBase):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+
+# built once: validates rows or ORM objects and dumps them to JSON bytes in pydantic-core
+contact_list_adapter = TypeAdapter(list[ContactResponse])
+
+class ContactBatchUpdate(ContactUpdate):
+    id: int
+
+class ContactBatchDelete(BaseModel):
+    ids: list[int] = Field(min_length=1)
+
+class ContactBatchResult(BaseModel):
     id: int
-    class Config:
-        orm_mode = True
+    status: str  # updated, deleted or not_found
+    contact: Optional[ContactResponse] = None
+
+class DuplicatePair(BaseModel):
+    ids: tuple[int, int]
+    score: float
+
+class DuplicateCluster(BaseModel):
+    score: float
+    contacts: list[ContactResponse]
+    pairs: list[DuplicatePair]
+
+class ContactMerge(BaseModel):
+    primary: int
+    duplicates: list[int] = Field(min_length=1)
+
+class BulkRowError(BaseModel):
+    row: int
+    detail: str
+
+class BulkImportResponse(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: list[BulkRowError] = []
 
 class UserModel(BaseModel):
     email: str
@@ -29,8 +66,13 @@ class UserDb(BaseModel):
     email: str
     avatar: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AvatarStatusResponse(BaseModel):
+    status: str
+    avatar: Optional[str] = None
+    detail: Optional[str] = None
 
 
 class UserResponse(BaseModel):
@@ -0,0 +1,144 @@
+import re
+from difflib import SequenceMatcher
+
+from sqlalchemy import select, func, literal_column, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Contact, CONTACT_SEARCH_COLUMNS, CONTACT_SEARCH_DOCUMENT, fts_user_key
+
+# how many candidates the index returns per requested result before they are re-ranked
+CANDIDATES_FACTOR = 4
+MIN_SCORE = 0.5
+
+_term_re = re.compile(r"\w[\w.@+-]*")
+
+
+def search_terms(q: str) -> list[str]:
+    """
+    The search_terms function splits the query into lowercased terms.
+
+    :param q: str: query typed by the user
+    :return: list of terms
+    """
+    return _term_re.findall(q.lower())
+
+
+def like_escape(term: str) -> str:
+    """
+    The like_escape function escapes the LIKE wildcards of a term, so it matches literally with escape="\\".
+    """
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def trigrams(term: str) -> set[str]:
+    """
+    The trigrams function returns the trigrams of the term and, for short terms, of its one-letter deletions.
+    The deletions keep transposed and doubled letters of short words findable in a trigram index,
+    longer words always keep some trigrams intact after a single typo.
+
+    :param term: str: search term
+    :return: set of trigrams
+    """
+    variants = {term} | {term[:i] + term[i + 1:] for i in range(len(term))} if 3 < len(term) <= 6 else {term}
+    return {variant[i:i + 3] for variant in variants for i in range(len(variant) - 2)}
+
+
+def score_term(term: str, word: str, matcher: SequenceMatcher | None = None, floor: float = 0.0) -> float:
+    """
+    The score_term function rates how well a single word matches a term: exact, prefix, substring or typo.
+    The typo similarity is only computed when it can beat floor.
+    """
+    if word == term:
+        return 1.0
+    if word.startswith(term):
+        return 0.9
+    if term in word:
+        return 0.75
+    if matcher is None:
+        matcher = SequenceMatcher(None, b=term)
+    matcher.set_seq1(word)
+    if matcher.real_quick_ratio() * 0.8 <= floor or matcher.quick_ratio() * 0.8 <= floor:
+        return 0.0
+    return matcher.ratio() * 0.8
+
+
+def score_contact(contact: Contact, terms: list[str]) -> float:
+    """
+    The score_contact function rates a contact against all terms of the query.
+    Every term scores against its best matching word in any searchable column, the scores are averaged.
+
+    :param contact: Contact: candidate contact
+    :param terms: list[str]: terms of the query
+    :return: score from 0 to 1
+    """
+    words = [word for column in CONTACT_SEARCH_COLUMNS
+             for word in search_terms(str(getattr(contact, column) or ''))]
+    if not words or not terms:
+        return 0.0
+    total = 0.0
+    for term in terms:
+        # the matcher caches its analysis of the term across words
+        matcher = SequenceMatcher(None, b=term)
+        best = 0.0
+        for word in words:
+            best = max(best, score_term(term, word, matcher, best))
+            if best == 1.0:
+                break
+        total += best
+    return total / len(terms)
+
+
+def _sqlite_candidates(user_id: int, terms: list[str], limit: int):
+    grams = set().union(*(trigrams(term) for term in terms))
+    if not grams:
+        # terms shorter than a trigram, fall back to a prefix scan of the user's contacts
+        return (select(Contact).filter(Contact.user_id == user_id)
+                .filter(or_(*(getattr(Contact, column).ilike(f"{like_escape(term)}%", escape="\\")
+                              for column in CONTACT_SEARCH_COLUMNS for term in terms)))
+                .order_by(Contact.id).limit(limit))
+    match = 'user_key : "{}" AND ({})'.format(
+        fts_user_key(user_id), " OR ".join('"{}"'.format(gram.replace('"', '""')) for gram in sorted(grams)))
+    return (select(Contact)
+            .from_statement(text(
+                "SELECT contacts.* FROM contacts_fts JOIN contacts ON contacts.id = contacts_fts.rowid "
+                "WHERE contacts_fts MATCH :match AND contacts.user_id = :user_id "
+                "ORDER BY bm25(contacts_fts, 0, 1, 1, 1, 1, 1) LIMIT :limit"
+            ).bindparams(match=match, user_id=user_id, limit=limit)))
+
+
+def _postgresql_candidates(user_id: int, q: str, terms: list[str], limit: int):
+    # the document is inlined so the expression matches the GIN indexes, only q is a bind parameter
+    document = literal_column(f"({CONTACT_SEARCH_DOCUMENT})")
+    vector = func.to_tsvector(literal_column("'simple'"), document)
+    prefixes = [re.sub(r"\W", "", term) for term in terms]
+    query = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{prefix}:*" for prefix in prefixes if prefix))
+    return (select(Contact).filter(Contact.user_id == user_id)
+            .filter(or_(document.ilike(f"%{like_escape(q)}%", escape="\\"), func.word_similarity(q, document) > 0.3, vector.op("@@")(query)))
+            .order_by((func.word_similarity(q, document) + func.ts_rank(vector, query)).desc())
+            .limit(limit))
+
+
+async def search_contacts(user_id: int, q: str, db: AsyncSession, limit: int = 25) -> list[Contact]:
+    """
+    The search_contacts function finds the user's contacts by prefix, substring or a word with a typo
+    in any of the searchable columns and returns them ranked by score_contact.
+    Candidates come from the FTS5 trigram table on SQLite and from the pg_trgm/tsvector indexes on Postgres.
+
+    :param user_id: int: owner of the contacts
+    :param q: str: query typed by the user
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param limit: int: maximum number of results
+    :return: ranked list of contacts
+    """
+    terms = search_terms(q)
+    if not terms:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        query = _postgresql_candidates(user_id, q.lower(), terms, limit * CANDIDATES_FACTOR)
+    else:
+        query = _sqlite_candidates(user_id, terms, limit * CANDIDATES_FACTOR)
+    candidates = (await db.execute(query)).scalars().all()
+    scored = [(score_contact(contact, terms), contact) for contact in candidates]
+    scored = [item for item in scored if item[0] >= MIN_SCORE]
+    scored.sort(key=lambda item: (-item[0], item[1].id))
+    return [contact for _, contact in scored[:limit]]
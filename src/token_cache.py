@@ -0,0 +1,55 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """
+    Bounded in-process cache of verified JWT claims keyed by the sha256 digest of the token.
+    A token is stateless and valid until its exp, so its decoded claims can be reused until then
+    instead of verifying the signature on every request.
+    """
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self._claims = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        """
+        Get the cached claims of the token.
+
+        :param token: str: encoded jwt
+        :return: claims or None if the token was not verified yet or has expired
+        """
+        key = self.key(token)
+        entry = self._claims.get(key)
+        if entry is not None:
+            expire, claims = entry
+            if expire > time.time():
+                self._claims.move_to_end(key)
+                self.hits += 1
+                return claims
+            del self._claims[key]
+        self.misses += 1
+        return None
+
+    def set(self, token: str, claims: dict) -> None:
+        """
+        Remember the claims of a verified token until its exp.
+
+        :param token: str: encoded jwt
+        :param claims: dict: verified claims, tokens without exp are not cached
+        """
+        if self.size <= 0 or "exp" not in claims:
+            return
+        key = self.key(token)
+        self._claims[key] = (float(claims["exp"]), claims)
+        self._claims.move_to_end(key)
+        while len(self._claims) > self.size:
+            self._claims.popitem(last=False)
@@ -0,0 +1,112 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+from redis.exceptions import RedisError
+
+
+@dataclass(frozen=True, slots=True)
+class AuthPrincipal:
+    """
+    The authenticated user as the routes see it: the columns they need and nothing attached to a session.
+    The password hash and the refresh token are never loaded for it.
+    """
+    id: int
+    email: str
+    avatar: str | None
+    confirmed: bool
+
+
+class UserCache:
+    """
+    Read-through cache of authenticated users.
+
+    A small in-process LRU sits in front of Redis, so repeat requests on the same worker
+    skip the network as well as the database. Only the fields needed by the routes are cached,
+    the password hash and the refresh token never leave the database.
+    """
+    fields = tuple(AuthPrincipal.__dataclass_fields__)
+
+    def __init__(self, redis_client=None, ttl: int = 300, local_ttl: int = 5, local_size: int = 1024):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self._local = OrderedDict()
+
+    def bind(self, redis_client) -> None:
+        """
+        Attach the Redis client used as the shared tier.
+        """
+        self.redis = redis_client
+
+    @staticmethod
+    def key(email: str) -> str:
+        return f"user:{email}"
+
+    def _remember(self, email: str, data: dict) -> None:
+        if self.local_size <= 0:
+            return
+        self._local[email] = (time.monotonic() + self.local_ttl, data)
+        self._local.move_to_end(email)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def get(self, email: str) -> AuthPrincipal | None:
+        """
+        Get the cached user by email.
+
+        :param email: str: user email
+        :return: AuthPrincipal or None on a miss
+        """
+        entry = self._local.get(email)
+        if entry is not None:
+            expire, data = entry
+            if expire > time.monotonic():
+                self._local.move_to_end(email)
+                return AuthPrincipal(**data)
+            del self._local[email]
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self.key(email))
+        except RedisError:
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        self._remember(email, data)
+        return AuthPrincipal(**data)
+
+    async def set(self, user: AuthPrincipal) -> None:
+        """
+        Put the user into both cache tiers.
+
+        :param user: AuthPrincipal: user loaded from the database
+        """
+        data = asdict(user)
+        self._remember(user.email, data)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self.key(user.email), json.dumps(data), ex=self.ttl)
+        except RedisError:
+            pass
+
+    async def invalidate(self, email: str) -> None:
+        """
+        Drop the user from both cache tiers. Must be called after every change of the user row.
+
+        :param email: str: user email
+        """
+        self._local.pop(email, None)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self.key(email))
+        except RedisError:
+            pass
+
+
+user_cache = UserCache()
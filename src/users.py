@@ -1,18 +1,44 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload
 from libgravatar import Gravatar
 from src.database.models import User
 from src.schemas import UserModel
+from src.user_cache import AuthPrincipal, user_cache
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+async def get_user_by_email(email: str, db: AsyncSession, *columns) -> User:
     """
     The get_user_by_email function is used to return contact from the database.
+    With columns only those are loaded and reading any other one raises instead of querying again,
+    relationships are never loaded.
+
+    :param email: str: user email
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param columns: User attributes the caller needs, all of them by default
     :return: contact
     """
-    return db.query(User).filter(User.email == email).first()
+    query = select(User).filter(User.email == email).options(raiseload("*"))
+    if columns:
+        query = query.options(load_only(*columns, raiseload=True))
+    result = await db.execute(query)
+    return result.scalar()
+
+
+async def get_principal_by_email(email: str, db: AsyncSession) -> AuthPrincipal | None:
+    """
+    The get_principal_by_email function reads only the columns of AuthPrincipal, no entity is created.
+
+    :param email: str: user email
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :return: AuthPrincipal or None
+    """
+    columns = [getattr(User, field) for field in AuthPrincipal.__dataclass_fields__]
+    row = (await db.execute(select(*columns).filter(User.email == email))).first()
+    return None if row is None else AuthPrincipal(*row)
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     The create_user function is used to create new contact.
     :return: new user contact
@@ -23,32 +49,46 @@ async def create_user(body: UserModel, db: Session) -> User:
         avatar = g.get_image()
     except Exception as e:
         print(e)
-    new_user = User(**body.dict(), avatar=avatar)
+    new_user = User(**body.model_dump(), avatar=avatar)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
     user.refresh_token = token
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(user.email)
+
+
+async def update_password(user: User, password_hash: str, db: AsyncSession) -> None:
+    """
+    The update_password function stores a new password hash of the user.
+
+    :param user: User: user to update
+    :param password_hash: str: new hash
+    :param db: AsyncSession: Pass the database session to the repository layer
+    """
+    user.password = password_hash
+    await db.commit()
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     The confirmed_email function is used to confirm a user's email address.
     It takes the email and get user by email and checks if user  confirmed or not.
    
     :param email: str: Get email
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
 
     """
-    user = await get_user_by_email(email, db)
+    user = await get_user_by_email(email, db, User.email)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(email)
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """
     The update_avatar function is used to update avatar.
     It takes the email and get user by email and checks if user  confirmed or not.
@@ -56,7 +96,8 @@ async def update_avatar(email, url: str, db: Session) -> User:
     :param email: str: Get email
 
     """
-    user = await get_user_by_email(email, db)
+    user = await get_user_by_email(email, db, User.email)
     user.avatar = url
-    db.commit()
-    return user
\ No newline at end of file
+    await db.commit()
+    await user_cache.invalidate(email)
+    return user
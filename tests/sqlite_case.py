@@ -0,0 +1,24 @@
+import tempfile
+import unittest
+
+from src.database.db import AsyncSessionLocal, make_async_engine
+from src.database.models import Base
+
+
+class SQLiteTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs every test against a fresh SQLite file with the full schema, the search triggers included.
+    self.engine is bound to it and self.db is an open session, add the rows in asyncSetUp after super().
+    """
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = make_async_engine(f"sqlite:///{self.tmp.name}/test.db")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.db = AsyncSessionLocal(bind=self.engine)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+        self.tmp.cleanup()
@@ -0,0 +1,59 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fakeredis import aioredis
+from PIL import Image
+
+from src.avatars import AvatarStatus, LocalAvatarStorage, resize_avatar, store_avatar
+
+
+def photo(width: int, height: int, fmt: str = "JPEG") -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), "green").save(buf, fmt)
+    return buf.getvalue()
+
+
+class TestAvatars(unittest.IsolatedAsyncioTestCase):
+
+    def test_resize_crops_to_square_jpeg(self):
+        for data in (photo(4000, 3000), photo(100, 300, "PNG")):
+            with Image.open(io.BytesIO(resize_avatar(data, 250))) as image:
+                self.assertEqual(image.format, "JPEG")
+                self.assertEqual(image.size, (250, 250))
+
+    def test_resize_rejects_non_image(self):
+        with self.assertRaises(ValueError):
+            resize_avatar(b"not an image")
+
+    async def test_local_storage_saves_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            storage = LocalAvatarStorage(root, "/static/avatars/")
+            url = await storage.save("post@emeta.ua", b"jpeg")
+            self.assertTrue(url.startswith("/static/avatars/"))
+            self.assertNotIn("post@emeta.ua", url)
+            name = url.rsplit("/", 1)[1].split("?")[0]
+            self.assertEqual((Path(root) / name).read_bytes(), b"jpeg")
+            self.assertNotEqual(url, await storage.save("post@emeta.ua", b"other"))
+
+    async def test_store_avatar_records_status(self):
+        status = AvatarStatus(aioredis.FakeRedis())
+        storage = MagicMock()
+        storage.save = AsyncMock(return_value="/static/avatars/a.jpg")
+        with patch("src.avatars.avatar_status", status), \
+                patch("src.avatars.async_session", MagicMock()), \
+                patch("src.avatars.repository_users.update_avatar", AsyncMock()) as update_avatar:
+            await store_avatar("post@emeta.ua", b"jpeg", storage)
+            self.assertEqual(update_avatar.await_args.args[:2], ("post@emeta.ua", "/static/avatars/a.jpg"))
+            self.assertEqual((await status.get("post@emeta.ua"))["status"], "done")
+
+            storage.save.side_effect = OSError("offline")
+            await store_avatar("post@emeta.ua", b"jpeg", storage)
+            self.assertEqual(await status.get("post@emeta.ua"),
+                             {"status": "failed", "avatar": None, "detail": "offline"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from datetime import date
+
+from src.birthdays import month_day_ranges, next_birthday
+
+
+def covers(ranges, month, day):
+    return any(m == month and first <= day <= last for m, first, last in ranges)
+
+
+class TestBirthdays(unittest.TestCase):
+
+    def test_ranges_inside_month(self):
+        self.assertEqual(month_day_ranges(date(2023, 5, 10), 7), [(5, 10, 16)])
+
+    def test_ranges_year_wrap(self):
+        self.assertEqual(month_day_ranges(date(2023, 12, 29), 7), [(12, 29, 31), (1, 1, 4)])
+
+    def test_ranges_feb_29_in_common_year(self):
+        self.assertEqual(month_day_ranges(date(2023, 2, 27), 3), [(2, 27, 29), (3, 1, 1)])
+
+    def test_ranges_feb_29_in_leap_year(self):
+        self.assertEqual(month_day_ranges(date(2024, 2, 27), 3), [(2, 27, 29)])
+
+    def test_ranges_long_window_never_overlap_the_start(self):
+        ranges = month_day_ranges(date(2023, 3, 15), 330)
+        self.assertEqual((ranges[0], ranges[-1]), ((3, 15, 31), (2, 1, 7)))
+        self.assertFalse(covers(ranges, 3, 1))
+        ranges = month_day_ranges(date(2023, 3, 15), 360)
+        self.assertEqual((ranges[0], ranges[-1]), ((3, 15, 31), (3, 1, 8)))
+        self.assertTrue(covers(ranges, 3, 8))
+        self.assertFalse(covers(ranges, 3, 9))
+        self.assertFalse(covers(ranges, 3, 14))
+
+    def test_ranges_whole_year(self):
+        self.assertEqual(month_day_ranges(date(2023, 3, 15), 365)[-1], (3, 1, 13))
+        self.assertIsNone(month_day_ranges(date(2023, 3, 15), 366))
+        # a window of 365 days without February 29 still has every birthday, the 29th is celebrated on the 28th
+        self.assertIsNone(month_day_ranges(date(2022, 3, 15), 365))
+
+    def test_next_birthday(self):
+        self.assertEqual(next_birthday(date(1990, 1, 2), date(2023, 12, 30)), date(2024, 1, 2))
+        self.assertEqual(next_birthday(date(1990, 12, 30), date(2023, 12, 30)), date(2023, 12, 30))
+        self.assertEqual(next_birthday(date(1992, 2, 29), date(2023, 2, 1)), date(2023, 2, 28))
+
+
+if __name__ == '__main__':
+    unittest.main()
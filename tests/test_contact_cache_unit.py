@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+
+import fakeredis.aioredis as fakeredis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError
+
+from src.contact_cache import ContactCache, etag_matches, make_etag
+
+
+class TestEtag(unittest.TestCase):
+
+    def test_etag_matches(self):
+        etag = make_etag(1, 5)
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"x", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches(make_etag(1, 6), etag))
+        self.assertNotEqual(make_etag(2, 5), etag)
+        self.assertNotEqual(make_etag(1, 5, 7), etag)
+        self.assertNotEqual(make_etag(1, 5, 7), make_etag(1, 5, 8))
+
+
+class TestContactCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.cache = ContactCache(self.redis, ttl=60)
+
+    async def test_version_is_stable_until_bump(self):
+        version = await self.cache.version(1)
+        self.assertEqual(await self.cache.version(1), version)
+        await self.cache.bump(1)
+        self.assertGreater(await self.cache.version(1), version)
+        self.assertNotEqual(await self.cache.version(2), await self.cache.version(1) + 1)
+
+    async def test_lost_counter_does_not_repeat(self):
+        await self.cache.bump(1)
+        old = await self.cache.version(1)
+        await self.redis.flushall()
+        self.assertGreater(await self.cache.version(1), old)
+
+    async def test_pages_are_per_version(self):
+        version = await self.cache.version(1)
+        await self.cache.set_page(1, version, "None:25", b"[]", "next")
+        self.assertEqual(await self.cache.get_page(1, version, "None:25"), (b"[]", "next"))
+        self.assertIsNone(await self.cache.get_page(1, version + 1, "None:25"))
+        self.assertGreater(await self.redis.ttl(self.cache.page_key(1, version, "None:25")), 0)
+
+    async def test_redis_down_means_no_version(self):
+        with patch.object(Pipeline, "execute", side_effect=ConnectionError), \
+                patch.object(self.redis, "get", side_effect=ConnectionError):
+            self.assertIsNone(await self.cache.version(1))
+            self.assertIsNone(await self.cache.get_page(1, 1, "x"))
+            await self.cache.bump(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from src.contact_writer import ContactWriter
+from src.database.db import AsyncSessionLocal
+from src.database.models import Contact, User
+from sqlite_case import SQLiteTestCase
+
+
+def contact(email: str) -> dict:
+    return {"firstname": "Anna", "lastname": "Smith", "email": email, "phone": "050 111 22 33",
+            "birthdate": date(1990, 5, 17), "otherinform": ""}
+
+
+class TestContactWriter(SQLiteTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.db.add(User(id=1, email="owner@b.c", password="x"))
+        await self.db.commit()
+        self.writer = ContactWriter(max_batch=10, max_delay=0.01,
+                                    session_factory=lambda: AsyncSessionLocal(bind=self.engine))
+
+    async def asyncTearDown(self):
+        await self.writer.close()
+        await super().asyncTearDown()
+
+    async def count(self) -> int:
+        async with AsyncSessionLocal(bind=self.engine) as db:
+            return await db.scalar(select(func.count()).select_from(Contact))
+
+    async def test_concurrent_creates_share_one_batch(self):
+        created = await asyncio.gather(*(self.writer.create(1, contact(f"{i}@b.c")) for i in range(5)))
+        self.assertEqual([row["email"] for row in created], [f"{i}@b.c" for i in range(5)])
+        self.assertEqual(len({row["id"] for row in created}), 5)
+        self.assertEqual(created[0]["birthdate"], date(1990, 5, 17))
+        self.assertEqual(self.writer.metrics(), {"batches_total": 1, "rows_total": 5, "pending": 0})
+        self.assertEqual(await self.count(), 5)
+        async with AsyncSessionLocal(bind=self.engine) as db:
+            phones = (await db.execute(select(Contact.phone_e164).distinct())).scalars().all()
+        self.assertEqual(phones, ["+380501112233"])
+
+    async def test_full_batch_flushes_without_delay(self):
+        self.writer.max_delay = 60
+        created = await asyncio.wait_for(
+            asyncio.gather(*(self.writer.create(1, contact(f"{i}@b.c")) for i in range(10))), 5)
+        self.assertEqual(len(created), 10)
+
+    async def test_duplicate_fails_only_its_caller(self):
+        results = await asyncio.gather(self.writer.create(1, contact("a@b.c")),
+                                       self.writer.create(1, contact("a@b.c")),
+                                       self.writer.create(1, contact("b@b.c")), return_exceptions=True)
+        self.assertEqual(results[0]["email"], "a@b.c")
+        self.assertIsInstance(results[1], IntegrityError)
+        self.assertEqual(results[2]["email"], "b@b.c")
+        self.assertEqual(await self.count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from datetime import date
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from main import router_contacts
+from src.auth_services import auth_service
+from src.contacts import delete_contacts, update_contacts
+from src.database.db import get_db
+from src.database.models import Contact, User
+from sqlite_case import SQLiteTestCase
+
+
+class TestContactsBatch(SQLiteTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.db.add_all([User(id=1, email="one@b.c", password="x"), User(id=2, email="two@b.c", password="x")])
+        self.db.add_all([Contact(id=i, user_id=1 if i < 4 else 2, firstname=f"n{i}", email=f"{i}@b.c", phone=str(i),
+                                 birthdate=date(1990, 1, i)) for i in range(1, 5)])
+        await self.db.commit()
+
+    async def emails(self) -> dict:
+        result = await self.db.execute(select(Contact.id, Contact.email))
+        return dict(result.all())
+
+    async def test_update_contacts(self):
+        updated = await update_contacts(1, {1: {"email": "new1@b.c", "phone": "11"}, 2: {"phone": "22"},
+                                            4: {"email": "stolen@b.c"}, 9: {"phone": "9"}}, self.db)
+        self.assertEqual(set(updated), {1, 2})
+        self.assertEqual(updated[1]["email"], "new1@b.c")
+        self.assertEqual(updated[1]["birthdate"], date(1990, 1, 1))
+        self.assertEqual((updated[2]["email"], updated[2]["phone"]), ("2@b.c", "22"))
+        self.assertEqual(await self.emails(), {1: "new1@b.c", 2: "2@b.c", 3: "3@b.c", 4: "4@b.c"})
+
+    async def test_update_contacts_normalizes(self):
+        await update_contacts(1, {1: {"email": "New1@B.c", "phone": "050 111 22 33"}}, self.db)
+        result = await self.db.execute(select(Contact.email_normalized, Contact.phone_e164).where(Contact.id == 1))
+        self.assertEqual(tuple(result.one()), ("new1@b.c", "+380501112233"))
+
+    async def test_update_contacts_conflict_changes_nothing(self):
+        with self.assertRaises(IntegrityError):
+            await update_contacts(1, {1: {"email": "x@b.c"}, 2: {"email": "3@b.c"}}, self.db)
+        await self.db.rollback()
+        self.assertEqual((await self.emails())[1], "1@b.c")
+
+    async def test_update_nothing(self):
+        self.assertEqual(await update_contacts(1, {}, self.db), {})
+
+    async def test_delete_contacts(self):
+        self.assertEqual(await delete_contacts(1, [1, 3, 4, 9], self.db), {1, 3})
+        self.assertEqual(set(await self.emails()), {2, 4})
+
+
+class TestContactsBatchRoutes(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(router_contacts)
+        self.db = MagicMock()
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth_service.get_current_user] = lambda: User(id=1)
+        self.client = TestClient(app)
+
+    def test_empty_batches_are_rejected(self):
+        self.assertEqual(self.client.patch("/contacts/batch", json=[]).status_code, 422)
+        self.assertEqual(self.client.post("/contacts/batch/delete", json={"ids": []}).status_code, 422)
+        self.db.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
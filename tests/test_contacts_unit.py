@@ -1,57 +1,163 @@
+import json
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from datetime import timedelta, date
 
-from sqlalchemy.orm import Session
+import fakeredis.aioredis as fakeredis
+from fastapi import HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User, Contact
-from src.schemas import ContactUpdate, ContactBase, ContactResponse
+from src.schemas import ContactUpdate, ContactBase, ContactResponse, ContactBatchUpdate, ContactBatchDelete
+from src.contacts import encode_cursor, decode_cursor
 from main import (
     get_contact,
     get_contacts,
     get_birthday,
-    remove_contact 
+    remove_contact,
+    update_contact,
+    update_contacts,
+    remove_contacts,
+    contacts_changed,
 )
 
+class FixedDate(date):
+
+    @classmethod
+    def today(cls):
+        return cls(2023, 6, 14)
+
+
 class TestContacts(unittest.IsolatedAsyncioTestCase):
     
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.session.execute.return_value = MagicMock()
         self.user = User(id=1)
+        self.request = MagicMock(headers={})
+
+    def rows(self, *ids):
+        return [MagicMock(_asdict=lambda i=i: {"id": i, "email": f"{i}@b.c", "birthdate": date(1990, 1, i)})
+                for i in ids]
 
     async def test_get_contacts(self):
-        contacts = [Contact(), Contact(), Contact()]
-        self.session.query().filter().all.return_value = contacts
-        result = await get_contacts(db=self.session, user=self.user)
-        self.assertEqual(result, contacts)
+        self.session.execute.return_value.all.return_value = self.rows(1, 2, 3)
+        result = await get_contacts(request=self.request, response=Response(), cursor=None, limit=25,
+                                    format="json", db=self.session, current_user=self.user)
+        self.assertEqual([contact["id"] for contact in json.loads(result.body)], [1, 2, 3])
+        self.assertEqual(json.loads(result.body)[0]["birthdate"], "1990-01-01")
+        self.assertNotIn("X-Next-Cursor", result.headers)
+
+    async def test_get_contacts_next_cursor(self):
+        self.session.execute.return_value.all.return_value = self.rows(1, 2, 3)
+        result = await get_contacts(request=self.request, response=Response(), cursor=None, limit=2,
+                                    format="json", db=self.session, current_user=self.user)
+        self.assertEqual([contact["id"] for contact in json.loads(result.body)], [1, 2])
+        self.assertEqual(result.headers["X-Next-Cursor"], encode_cursor(2))
+
+    async def test_get_contacts_bad_cursor(self):
+        with self.assertRaises(HTTPException):
+            await get_contacts(request=self.request, response=MagicMock(), cursor="bad", limit=25,
+                               format="json", db=self.session, current_user=self.user)
+
+    async def test_get_contacts_etag_and_cached_page(self):
+        self.session.execute.return_value.all.return_value = self.rows(1)
+        with patch("main.contact_cache.redis", fakeredis.FakeRedis()):
+            first = await get_contacts(request=self.request, response=Response(), cursor=None, limit=25,
+                                       format="json", db=self.session, current_user=self.user)
+            second = await get_contacts(request=self.request, response=Response(), cursor=None, limit=25,
+                                        format="json", db=self.session, current_user=self.user)
+            self.session.execute.assert_awaited_once()
+            self.assertEqual(second.body, first.body)
+            self.assertEqual(json.loads(first.body)[0]["email"], "1@b.c")
+
+            request = MagicMock(headers={"if-none-match": first.headers["etag"]})
+            self.session.execute.return_value.first.return_value = None
+            # the list ETag does not answer for a contact, a missing one is still 404
+            with self.assertRaises(HTTPException) as missing:
+                await get_contact(contact_id=999, request=request, response=Response(), db=self.session,
+                                  current_user=self.user)
+            self.assertEqual(missing.exception.status_code, 404)
+            self.session.execute.return_value.first.return_value = self.rows(1)[0]
+            response = Response()
+            await get_contact(contact_id=1, request=self.request, response=response, db=self.session,
+                              current_user=self.user)
+            contact_request = MagicMock(headers={"if-none-match": response.headers["etag"]})
+            not_modified = await get_contact(contact_id=1, request=contact_request, response=Response(),
+                                             db=self.session, current_user=self.user)
+            self.assertEqual(not_modified.status_code, 304)
+            self.session.execute.return_value.first.return_value = None
+            with self.assertRaises(HTTPException):
+                await get_contact(contact_id=2, request=contact_request, response=Response(), db=self.session,
+                                  current_user=self.user)
+            self.session.execute.reset_mock()
+            await contacts_changed(self.user.id)
+            changed = await get_contacts(request=request, response=Response(), cursor=None, limit=25,
+                                         format="json", db=self.session, current_user=self.user)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], first.headers["etag"])
+        self.assertEqual(self.session.execute.await_count, 1)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(42)), 42)
     
     async def test_get_contact_by_id_found(self):
-        mock_contact = Contact()
-        self.session.query().filter().first.return_value = mock_contact
-        result = await get_contact(contact_id=1, db=self.session, user=self.user)
-        self.assertEqual(result, mock_contact)
+        self.session.execute.return_value.first.return_value = self.rows(7)[0]
+        result = await get_contact(contact_id=1, request=self.request, response=Response(), db=self.session,
+                                   current_user=self.user)
+        self.assertEqual(result["id"], 7)
 
     async def test_get_contact_by_id_not_found(self):
-        self.session.query().filter().first.return_value = None
-        result = await get_contact(contact_id=1, db=self.session, user=self.user)
-        self.assertIsNone(result)
+        self.session.execute.return_value.first.return_value = None
+        with self.assertRaises(HTTPException):
+            await get_contact(contact_id=1, request=self.request, response=Response(), db=self.session,
+                              current_user=self.user)
 
     async def test_get_birthdays(self):
-        contacts = [Contact(), Contact(), Contact()]
-        self.session.execute.return_value.scalars.return_value.all.return_value = contacts
-        result = await get_birthday(db=self.session, user=self.user)
-        self.assertEqual(result, contacts)
+        # a fixed day in a common year, the birthdates of today + n always exist in 1990
+        today = FixedDate.today()
+        contacts = [Contact(id=i, firstname="a", lastname="b", email="a@b.c", phone="1", otherinform="",
+                            birthdate=(today + timedelta(days=2 - i)).replace(year=1990)) for i in range(3)]
+        self.session.execute.return_value.all.return_value = contacts
+        with patch("main.birthday_cache.redis", None), patch("main.date", FixedDate):
+            result = await get_birthday(days=7, db=self.session, current_user=self.user)
+        self.assertEqual([contact["id"] for contact in result], [2, 1, 0])
 
     async def test_remove_contact_found(self):
-        mock_contact = Contact()
-        self.session.query().filter().first.return_value = mock_contact
-        result = await remove_contact(contact_id=1, db=self.session, user=self.user)
-        self.assertEqual(result, mock_contact)
+        row = self.rows(1)[0]
+        self.session.execute.return_value.first.return_value = row
+        result = await remove_contact(contact_id=1, db=self.session, current_user=self.user)
+        self.assertEqual(result["id"], 1)
+        self.session.execute.assert_awaited_once()
+        self.session.commit.assert_awaited_once()
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
-        result = await remove_contact(user=self.user, contact_id=1, db=self.session)
-        self.assertIsNone(result)
+        self.session.execute.return_value.first.return_value = None
+        with self.assertRaises(HTTPException):
+            await remove_contact(current_user=self.user, contact_id=1, db=self.session)
+
+    async def test_update_contacts_duplicate_id(self):
+        patch = dict(firstname="a", lastname="b", email="a@b.c", phone="1", birthdate=date(1990, 1, 1), otherinform="")
+        with self.assertRaises(HTTPException) as raised:
+            await update_contacts(body=[ContactBatchUpdate(id=1, **patch), ContactBatchUpdate(id=1, **patch)],
+                                  db=self.session, current_user=self.user)
+        self.assertEqual(raised.exception.status_code, 422)
+        self.session.execute.assert_not_awaited()
+
+    async def test_remove_contacts_results_in_request_order(self):
+        self.session.execute.return_value.scalars.return_value.all.return_value = [3]
+        with patch("main.contacts_changed") as changed:
+            result = await remove_contacts(body=ContactBatchDelete(ids=[3, 2]), db=self.session, current_user=self.user)
+        self.assertEqual(json.loads(result.body), [{"id": 3, "status": "deleted", "contact": None},
+                                                   {"id": 2, "status": "not_found", "contact": None}])
+        changed.assert_awaited_once_with(1)
+
+    async def test_update_contact_not_found(self):
+        self.session.execute.return_value.first.return_value = None
+        with self.assertRaises(HTTPException):
+            await update_contact(body=ContactUpdate(firstname="a", lastname="b", email="a@b.c", phone="123",
+                                                    birthdate=date(1990, 1, 1), otherinform=""), contact_id=1,
+                                 db=self.session, current_user=self.user)
 
     
 if __name__ == '__main__':
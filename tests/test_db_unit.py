@@ -0,0 +1,51 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import text
+
+from src.database.db import TimedAsyncQueuePool, engine_options, make_async_engine, make_engine, pool_stats
+
+
+class TestDatabase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.dir.name, 'test.db')}"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_engine_options(self):
+        self.assertNotIn("pool_size", engine_options("sqlite://"))
+        options = engine_options("postgresql+asyncpg://user@localhost/db", is_async=True)
+        self.assertIs(options["poolclass"], TimedAsyncQueuePool)
+        self.assertIn("pool_recycle", options)
+        self.assertNotIn("connect_args", options)
+
+    def test_sqlite_pragmas(self):
+        engine = make_engine(self.url)
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(connection.execute(text("PRAGMA synchronous")).scalar(), 1)
+        engine.dispose()
+
+    async def test_pool_stats_count_waits_and_timeouts(self):
+        engine = make_async_engine(self.url, pool_size=1, max_overflow=0, pool_timeout=0.05)
+
+        async def hold():
+            async with engine.connect():
+                await asyncio.sleep(0.2)
+
+        results = await asyncio.gather(hold(), hold(), return_exceptions=True)
+        stats = pool_stats(engine)
+        await engine.dispose()
+        self.assertEqual(sum(isinstance(result, Exception) for result in results), 1)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertGreaterEqual(stats["max_wait_seconds"], 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
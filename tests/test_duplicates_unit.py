@@ -0,0 +1,104 @@
+import unittest
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from src.database.models import Contact, User
+from src.duplicates import (
+    blocking_keys,
+    candidate,
+    clusters,
+    duplicate_pairs,
+    find_duplicates,
+    merge_contacts,
+    merged_values,
+    soundex,
+)
+from sqlite_case import SQLiteTestCase
+
+
+def row(id, firstname, lastname="", email=None, phone=None):
+    return SimpleNamespace(id=id, firstname=firstname, lastname=lastname, email=email, phone=phone)
+
+
+class TestDuplicateRules(unittest.TestCase):
+
+    def test_soundex(self):
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Rupert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex("Lee"), "L000")
+        self.assertIsNone(soundex("Олена"))
+
+    def test_blocking_keys_ignore_name_order(self):
+        self.assertEqual(blocking_keys(candidate(row(1, "Anna", "Smith"))),
+                         blocking_keys(candidate(row(2, "Smyth", "Ana"))))
+
+    def test_pairs(self):
+        rows = [row(1, "Jon", "Smith", phone="+380501112233"), row(2, "John", "Smith", phone="050 111 22 33"),
+                row(3, "Bob", "Jones", phone="0501112233"), row(4, "Anna", "Lee", email="A@b.c"),
+                row(5, "Anna", "Lee", email="a@b.c "), row(6, "Anna", "Lee", phone="0671112233"),
+                row(7, "Anna", "Lee", phone="0931112233", email="c@b.c")]
+        pairs = duplicate_pairs(rows, 0.8, 20)
+        self.assertIn((1, 2), pairs)
+        self.assertIn((4, 5), pairs)
+        # a shared phone with another name, a name with another phone
+        self.assertNotIn((1, 3), pairs)
+        self.assertNotIn((6, 7), pairs)
+        # the same name and nothing to contradict it
+        self.assertEqual(duplicate_pairs(rows, 0.75, 20)[4, 6], 0.75)
+        self.assertEqual(clusters({(1, 2): 1.0, (4, 5): 1.0, (5, 6): 1.0}), [[1, 2], [4, 5, 6]])
+
+    def test_window_bounds_large_blocks(self):
+        rows = [row(i, f"Person{i}", phone="0501112233") for i in range(200)]
+        pairs = duplicate_pairs(rows, 0.0, 3)
+        self.assertIn((0, 1), pairs)
+        self.assertLessEqual(len(pairs), 200 * 3)
+
+    def test_merged_values(self):
+        primary = {"firstname": "Anna", "lastname": "", "email": "a@b.c", "phone": "", "birthdate": None,
+                   "otherinform": "friend"}
+        duplicate = {"firstname": "Ann", "lastname": "Lee", "email": "x@b.c", "phone": "1", "birthdate": date(1990, 1, 1),
+                     "otherinform": "colleague"}
+        self.assertEqual(merged_values(primary, [duplicate]), {"lastname": "Lee", "phone": "1",
+                                                               "birthdate": date(1990, 1, 1),
+                                                               "otherinform": "friend; colleague"})
+
+
+class TestDuplicates(SQLiteTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.db.add_all([User(id=1, email="one@b.c", password="x"), User(id=2, email="two@b.c", password="x")])
+        self.db.add_all([
+            Contact(id=1, user_id=1, firstname="Jon", lastname="Smith", phone="+380501112233", otherinform="work"),
+            Contact(id=2, user_id=1, firstname="John", lastname="Smith", phone="0501112233", email="j@b.c",
+                    birthdate=date(1990, 5, 17), otherinform="gym"),
+            Contact(id=3, user_id=1, firstname="Bob", lastname="Jones", phone="0671112233"),
+            Contact(id=4, user_id=2, firstname="John", lastname="Smith", phone="0501112233"),
+        ])
+        await self.db.commit()
+
+    async def test_find_duplicates(self):
+        groups = await find_duplicates(1, self.db)
+        self.assertEqual(len(groups), 1)
+        self.assertEqual([contact["id"] for contact in groups[0]["contacts"]], [1, 2])
+        self.assertEqual(groups[0]["pairs"][0]["ids"], (1, 2))
+
+    async def test_merge_contacts(self):
+        merged = await merge_contacts(1, {1: [2]}, self.db)
+        self.assertEqual(merged[0]["email"], "j@b.c")
+        self.assertEqual(merged[0]["birthdate"], date(1990, 5, 17))
+        self.assertEqual(merged[0]["otherinform"], "work; gym")
+        ids = (await self.db.execute(select(Contact.id).order_by(Contact.id))).scalars().all()
+        self.assertEqual(ids, [1, 3, 4])
+
+    async def test_merge_foreign_contact_changes_nothing(self):
+        self.assertIsNone(await merge_contacts(1, {1: [4]}, self.db))
+        ids = (await self.db.execute(select(Contact.id))).scalars().all()
+        self.assertEqual(len(ids), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import socket
+import unittest
+from email.message import EmailMessage
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiosmtplib
+from fakeredis import aioredis
+from fastapi_mail import ConnectionConfig
+
+from src.email_queue import EmailQueue
+from src.email_worker import EmailWorker, SMTPPool
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+def smtp_config(port: int = 1025) -> ConnectionConfig:
+    return ConnectionConfig(MAIL_USERNAME="", MAIL_PASSWORD="", MAIL_FROM="noreply@emeta.ua", MAIL_PORT=port,
+                            MAIL_SERVER="127.0.0.1", MAIL_STARTTLS=False, MAIL_SSL_TLS=False,
+                            USE_CREDENTIALS=False, VALIDATE_CERTS=False)
+
+
+async def build_message(email, host, config):
+    message = EmailMessage()
+    message["From"], message["To"], message["Subject"] = config.MAIL_FROM, email, "confirm"
+    message.set_content(host)
+    return message
+
+
+class FakePool:
+
+    def __init__(self, error=None):
+        self.config = smtp_config()
+        self.smtp = MagicMock()
+        self.smtp.send_message = AsyncMock(side_effect=error)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.smtp
+
+    async def close(self):
+        pass
+
+
+class TestEmailQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = aioredis.FakeRedis()
+        self.queue = EmailQueue(self.redis, dedupe_ttl=60, max_attempts=2, backoff=10)
+
+    async def test_enqueue_dedupes_address(self):
+        self.assertTrue(await self.queue.enqueue("post@emeta.ua", "http://host/"))
+        self.assertFalse(await self.queue.enqueue("post@emeta.ua", "http://host/"))
+        self.assertTrue(await self.queue.enqueue("other@emeta.ua", "http://host/"))
+        self.assertEqual(await self.redis.llen(EmailQueue.QUEUE), 2)
+
+    async def test_reserve_moves_batch_to_processing(self):
+        for i in range(3):
+            await self.queue.enqueue(f"{i}@emeta.ua", "http://host/")
+        batch = await self.queue.reserve(2, timeout=0.1)
+        self.assertEqual([json.loads(raw)["email"] for raw in batch], ["0@emeta.ua", "1@emeta.ua"])
+        self.assertEqual(await self.redis.llen(self.queue.processing), 2)
+        await self.queue.ack(batch[0])
+        self.assertEqual(await self.redis.llen(self.queue.processing), 1)
+
+    async def test_retry_backs_off_then_dead_letters(self):
+        await self.queue.enqueue("post@emeta.ua", "http://host/")
+        raw, = await self.queue.reserve(1, timeout=0.1)
+        self.assertTrue(await self.queue.retry(raw))
+        self.assertEqual(await self.queue.promote_due(), 0)
+        with patch("src.email_queue.time.time", return_value=10 ** 10):
+            self.assertEqual(await self.queue.promote_due(), 1)
+        raw, = await self.queue.reserve(1, timeout=0.1)
+        self.assertEqual(json.loads(raw)["attempts"], 1)
+        self.assertFalse(await self.queue.retry(raw))
+        self.assertEqual(await self.redis.llen(EmailQueue.DEAD), 1)
+        self.assertEqual(await self.redis.llen(self.queue.processing), 0)
+
+    async def test_recover_requeues_only_dead_workers(self):
+        other = EmailQueue(self.redis)
+        for i in range(2):
+            await self.queue.enqueue(f"{i}@emeta.ua", "http://host/")
+        await self.queue.heartbeat()
+        await other.heartbeat()
+        await self.queue.reserve(1, timeout=0.1)
+        await other.reserve(1, timeout=0.1)
+        # both are alive, nothing in flight is requeued
+        self.assertEqual(await other.recover(), 0)
+        await self.redis.delete(EmailQueue.heartbeat_key(self.queue.worker_id))
+        self.assertEqual(await other.recover(), 1)
+        self.assertEqual(await self.redis.llen(EmailQueue.QUEUE), 1)
+        self.assertEqual(await self.redis.llen(other.processing), 1)
+        self.assertEqual(await self.redis.smembers(EmailQueue.WORKERS), {other.worker_id.encode()})
+
+    async def test_worker_acks_sent(self):
+        pool = FakePool()
+        worker = EmailWorker(self.queue, pool, build_message)
+        await self.queue.enqueue("post@emeta.ua", "http://host/")
+        self.assertEqual(await worker.run_once(), 1)
+        self.assertEqual(worker.sent, 1)
+        pool.smtp.send_message.assert_awaited_once()
+        self.assertEqual(await self.redis.llen(self.queue.processing), 0)
+
+    async def test_worker_retires_on_stop(self):
+        worker = EmailWorker(self.queue, FakePool(), build_message, poll_timeout=0.01)
+        stop = asyncio.Event()
+        task = asyncio.create_task(worker.run(stop))
+        await asyncio.sleep(0.05)
+        self.assertTrue(await self.redis.exists(EmailQueue.heartbeat_key(self.queue.worker_id)))
+        stop.set()
+        await task
+        self.assertEqual(await self.redis.smembers(EmailQueue.WORKERS), set())
+
+    async def test_worker_dead_letters_refused_recipient(self):
+        worker = EmailWorker(self.queue, FakePool(aiosmtplib.SMTPRecipientsRefused([])), build_message)
+        await self.queue.enqueue("post@emeta.ua", "http://host/")
+        await worker.run_once()
+        self.assertEqual(worker.failed, 1)
+        self.assertEqual(await self.redis.llen(EmailQueue.DEAD), 1)
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestEmailWorkerSMTP(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.received = []
+
+        class Handler:
+            async def handle_DATA(handler, server, session, envelope):
+                self.received.append(envelope.rcpt_tos)
+                return "250 OK"
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.controller = Controller(Handler(), hostname="127.0.0.1", port=self.port)
+        await asyncio.to_thread(self.controller.start)
+        self.queue = EmailQueue(aioredis.FakeRedis())
+
+    async def asyncTearDown(self):
+        await asyncio.to_thread(self.controller.stop)
+
+    async def test_batch_reuses_connection(self):
+        pool = SMTPPool(smtp_config(self.port), size=1)
+        worker = EmailWorker(self.queue, pool, build_message, batch_size=10)
+        for i in range(5):
+            await self.queue.enqueue(f"{i}@emeta.ua", "http://host/")
+        self.assertEqual(await worker.run_once(), 5)
+        await pool.close()
+        self.assertEqual(len(self.received), 5)
+        self.assertEqual(pool.connects, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
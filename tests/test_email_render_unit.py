@@ -0,0 +1,30 @@
+import unittest
+
+import jwt
+
+from src.email import get_template, render_confirmations
+from src.auth_services import auth_service
+
+
+class TestEmailRender(unittest.TestCase):
+
+    def test_template_compiled_once(self):
+        self.assertIs(get_template(), get_template())
+
+    def test_render_confirmations(self):
+        first, second = render_confirmations(["first@emeta.ua", "second@emeta.ua"], "http://host/")
+        self.assertIn("Hi first@emeta.ua", first)
+        self.assertIn("http://host/api/auth/confirmed_email/", second)
+        token = second.split("confirmed_email/")[1].split('"')[0]
+        claims = jwt.decode(token, auth_service.verification_key, algorithms=[auth_service.ALGORITHM])
+        self.assertEqual(claims["sub"], "second@emeta.ua")
+
+    def test_render_one_letter_per_recipient(self):
+        recipients = [f"user{i}@emeta.ua" for i in range(50)]
+        bodies = render_confirmations(recipients, "http://host/")
+        self.assertEqual(len(bodies), 50)
+        self.assertTrue(all(f"Hi {email}" in body for email, body in zip(recipients, bodies)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from src.hashing import PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        context = CryptContext(schemes=["sha256_crypt", "md5_crypt"], deprecated="auto",
+                               sha256_crypt__default_rounds=1000)
+        self.hasher = PasswordHasher(context, workers=2, max_queue=1)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.hasher.hash("secret")
+        self.assertTrue(await self.hasher.verify("secret", hashed))
+        self.assertFalse(await self.hasher.verify("wrong", hashed))
+        self.assertEqual(self.hasher.metrics()["calls"], 3)
+
+    async def test_rehash_deprecated(self):
+        old = CryptContext(schemes=["md5_crypt"]).hash("secret")
+        verified, new_hash = await self.hasher.verify_and_update("secret", old)
+        self.assertTrue(verified)
+        self.assertTrue(new_hash.startswith("$5$"))
+
+    async def test_queue_limit(self):
+        self.hasher.pending = 3
+        with self.assertRaises(HTTPException) as err:
+            await self.hasher.hash("secret")
+        self.assertEqual(err.exception.status_code, 503)
+        self.assertEqual(self.hasher.metrics()["rejected"], 1)
+
+    async def test_concurrent_calls_finish(self):
+        hashes = await asyncio.gather(*(self.hasher.hash("secret") for _ in range(3)))
+        self.assertEqual(len(set(hashes)), 3)
+        self.assertEqual(self.hasher.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# generous on purpose: fastapi alone takes most of it, the test catches regressions like a DB connection at import
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", 5))
+
+
+def import_main(database_url: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "SQLALCHEMY_DATABASE_URL": database_url, "REDIS_HOST": "redis.invalid"}
+    code = ("import sys, main; print(','.join(m for m in ('aiosqlite', 'asyncpg', 'fastapi_mail', 'cloudinary') "
+            "if m in sys.modules))")
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=120)
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_import_main_is_lazy_and_fast(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            database = Path(tmp) / "app.db"
+            result = import_main(f"sqlite:///{database}")
+            self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+            self.assertFalse(database.exists(), "importing the app touched the database")
+        self.assertEqual(result.stdout.strip(), "", "drivers or clients imported at import time")
+
+        # import time: self [us] | cumulative [us] | package
+        times = {}
+        for match in re.finditer(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$", result.stderr, re.M):
+            times[match[4]] = (int(match[1]), int(match[2]))
+        own = sorted(((name, self_us) for name, (self_us, _) in times.items()
+                      if name == "main" or name.startswith("src.")), key=lambda item: -item[1])
+        total = times["main"][1] / 1e6
+        print(f"\nimport main: {total:.3f}s, slowest own modules: "
+              + ", ".join(f"{name} {self_us / 1000:.1f}ms" for name, self_us in own[:5]))
+        self.assertLess(total, IMPORT_BUDGET_SECONDS)
+
+    def test_import_main_reads_no_settings(self):
+        # no SQLALCHEMY_DATABASE_URL, SECRET_KEY, MAIL_* ...: the settings must not be resolved while importing
+        env = {"PATH": os.environ.get("PATH", "")}
+        code = "import main; from src.conf.config import get_settings; print(get_settings.cache_info().currsize)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True,
+                                timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        self.assertEqual(result.stdout.strip(), "0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+# a real load run takes seconds, it is opt-in: RUN_LOAD_TEST=1 python -m pytest tests/test_load_test.py
+@unittest.skipUnless(os.environ.get("RUN_LOAD_TEST"), "set RUN_LOAD_TEST=1 to run the load test")
+class TestLoadTest(unittest.TestCase):
+
+    def test_short_run_reports_every_route(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "load.json"
+            result = subprocess.run(
+                [sys.executable, "benchmarks/load_test.py", "--url", f"sqlite:///{tmp}/load.db", "--users", "2",
+                 "--contacts", "50", "--clients", "3", "--duration", "2", "--output", str(output)],
+                cwd=ROOT, capture_output=True, text=True, timeout=300)
+            self.assertEqual(result.returncode, 0, result.stderr[-3000:])
+            report = json.loads(output.read_text())
+        self.assertEqual(report["total"]["errors"], 0, report["total"]["statuses"])
+        self.assertIn("GET /contacts", report["routes"])
+        self.assertIn("POST /api/auth/login", report["routes"])
+        for stats in report["routes"].values():
+            self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+
+
+if __name__ == '__main__':
+    unittest.main()
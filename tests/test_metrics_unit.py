@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from src.metrics import MetricsMiddleware, StatsCollector, instrument_engine
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        instrument_engine(self.engine)
+        self.profiles = tempfile.TemporaryDirectory()
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            with self.engine.connect() as connection:
+                for _ in range(item_id):
+                    connection.execute(text("SELECT 1"))
+            return {"id": item_id}
+
+        app.add_middleware(MetricsMiddleware, profile_dir=self.profiles.name)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.profiles.cleanup()
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_counts_requests_and_queries_per_route(self):
+        before = self.sample("http_request_db_queries_sum", route="/items/{item_id}")
+        requests = self.sample("http_requests_total", method="GET", route="/items/{item_id}", status="200")
+        self.client.get("/items/3")
+        self.client.get("/items/2")
+        self.assertEqual(self.sample("http_request_db_queries_sum", route="/items/{item_id}") - before, 5)
+        self.assertEqual(self.sample("http_requests_total", method="GET", route="/items/{item_id}",
+                                     status="200") - requests, 2)
+        self.client.get("/missing")
+        self.assertGreater(self.sample("http_requests_total", method="GET", route="<unmatched>", status="404"), 0)
+
+    def test_profile_header_writes_report(self):
+        self.assertNotIn("x-profile-report", self.client.get("/items/1").headers)
+        report = self.client.get("/items/1", headers={"X-Profile": "1"}).headers["x-profile-report"]
+        with open(f"{self.profiles.name}/{report}") as file:
+            self.assertIn("read_item", file.read())
+
+    def test_stats_collector(self):
+        families = list(StatsCollector("pool", lambda: {"size": 5, "wait_seconds_total": 0.5, "name": "x"}).collect())
+        self.assertEqual([(family.name, family.type) for family in families],
+                         [("pool_size", "gauge"), ("pool_wait_seconds", "counter")])
+
+
+if __name__ == '__main__':
+    unittest.main()
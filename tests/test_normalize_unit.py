@@ -0,0 +1,31 @@
+import unittest
+
+from src.normalize import normalize_email, normalize_phone, normalized_columns
+
+
+class TestNormalize(unittest.TestCase):
+
+    def test_normalize_phone(self):
+        for phone in ("+380501112233", "+38 (050) 111-22-33", "050 111 22 33", "00380501112233", "380501112233",
+                      "501112233"):
+            self.assertEqual(normalize_phone(phone, "380"), "+380501112233", phone)
+        self.assertEqual(normalize_phone("(555) 123-4567", "1"), "+15551234567")
+        self.assertIsNone(normalize_phone("12-34", "380"))
+        # too short for a national number, not a phone with the default country code
+        self.assertIsNone(normalize_phone("12345", "380"))
+        self.assertIsNone(normalize_phone("0123-45-67", "380"))
+        self.assertIsNone(normalize_phone("+1234567890123456", "380"))
+        self.assertIsNone(normalize_phone(None))
+
+    def test_normalize_email(self):
+        self.assertEqual(normalize_email(" Anna.Lee@Example.COM "), "anna.lee@example.com")
+        self.assertIsNone(normalize_email(""))
+
+    def test_normalized_columns(self):
+        self.assertEqual(normalized_columns({"email": "A@b.c"}), {"email": "A@b.c", "email_normalized": "a@b.c"})
+        self.assertEqual(normalized_columns({"firstname": "Anna"}), {"firstname": "Anna"})
+        self.assertEqual(normalized_columns({"phone": "+380501112233"})["phone_e164"], "+380501112233")
+
+
+if __name__ == '__main__':
+    unittest.main()
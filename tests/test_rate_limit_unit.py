@@ -0,0 +1,96 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import fakeredis.aioredis as fakeredis
+from fastapi import HTTPException, Response
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError
+
+from src.database.models import User
+from src.rate_limit import RateLimit, SlidingWindowLimiter, parse_limit
+
+
+class TestSlidingWindowLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.limiter = SlidingWindowLimiter()
+
+    def test_parse_limit(self):
+        self.assertEqual(parse_limit("10/60"), (10, 60))
+
+    def test_limits_within_window(self):
+        for _ in range(3):
+            self.assertEqual(self.limiter.hit("k", 3, 60, now=600.0), 0)
+        self.assertAlmostEqual(self.limiter.hit("k", 3, 60, now=630.0), 30)
+        self.assertEqual(self.limiter.hit("other", 3, 60, now=630.0), 0)
+
+    def test_previous_window_slides_out(self):
+        for _ in range(4):
+            self.limiter.hit("k", 4, 60, now=610.0)
+        # 5 s into the next window 11/12 of the previous one still count
+        self.assertGreater(self.limiter.hit("k", 4, 60, now=665.0), 0)
+        self.assertEqual(self.limiter.hit("k", 4, 60, now=700.0), 0)
+
+    async def test_sync_shares_counts_between_processes(self):
+        # hit() starts background syncs with the real clock, so stay in the current window
+        now = time.time() // 60 * 60
+        window = int(now // 60)
+        redis = fakeredis.FakeRedis()
+        other = SlidingWindowLimiter(redis)
+        self.limiter.bind(redis)
+        for _ in range(2):
+            other.hit("k", 3, 60, now=now)
+        self.assertTrue(await other.sync(now=now))
+        self.limiter.hit("k", 3, 60, now=now)
+        await self.limiter.sync(now=now)
+        self.assertEqual(int(await redis.get(f"ratelimit:k:{window}")), 3)
+        self.assertGreater(self.limiter.hit("k", 3, 60, now=now + 1), 0)
+        self.assertGreater(await redis.ttl(f"ratelimit:k:{window}"), 0)
+        await self.limiter.close()
+        await other.close()
+
+    async def test_sync_failure_keeps_local_hits(self):
+        self.limiter.bind(fakeredis.FakeRedis())
+        self.limiter.hit("k", 2, 60, now=600.0)
+        with patch.object(Pipeline, "execute", side_effect=ConnectionError):
+            self.assertFalse(await self.limiter.sync(now=600.0))
+        self.assertEqual(self.limiter._counts["k", 60][10], [0, 1])
+        self.limiter.hit("k", 2, 60, now=600.0)
+        self.assertGreater(self.limiter.hit("k", 2, 60, now=600.0), 0)
+
+    def test_hit_drops_old_windows(self):
+        for minute in range(10, 100):
+            self.limiter.hit("k", 2, 60, now=minute * 60.0)
+        self.assertEqual(list(self.limiter._counts["k", 60]), [98, 99])
+
+    async def test_sync_drops_old_windows(self):
+        self.limiter.hit("k", 2, 60, now=600.0)
+        await self.limiter.sync(now=800.0)
+        self.assertEqual(self.limiter._counts, {})
+
+
+class TestRateLimit(unittest.IsolatedAsyncioTestCase):
+
+    async def test_rejects_with_retry_after(self):
+        dependency = RateLimit("route", times=1, seconds=60, limiter=SlidingWindowLimiter())
+        user = User(id=1, email="a@b.ua")
+        with patch("src.rate_limit.settings") as settings:
+            settings.rate_limits = {}
+            response = Response()
+            await dependency(response, user)
+            self.assertEqual(response.headers["X-RateLimit-Limit"], "1/60")
+            with self.assertRaises(HTTPException) as err:
+                await dependency(Response(), user)
+        self.assertEqual(err.exception.status_code, 429)
+        self.assertIn("Retry-After", err.exception.headers)
+
+    def test_settings_override(self):
+        dependency = RateLimit("route", times=1, seconds=60)
+        with patch("src.rate_limit.settings") as settings:
+            settings.rate_limits = {"route": "100/10"}
+            self.assertEqual(dependency.limit(), (100, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import redis.asyncio as redis
+
+from src.redis_pool import RedisPool
+
+
+class TestRedisPool(unittest.IsolatedAsyncioTestCase):
+
+    async def test_open_is_shared_and_sized_from_settings(self):
+        pool = RedisPool()
+        with patch("src.redis_pool.settings") as settings:
+            settings.redis_max_connections = 7
+            settings.redis_pool_timeout = 0.5
+            client = pool.open()
+        self.assertIs(pool.open(), client)
+        self.assertIsInstance(pool.pool, redis.BlockingConnectionPool)
+        self.assertEqual(pool.pool.max_connections, 7)
+        self.assertEqual(pool.pool.timeout, 0.5)
+        await pool.close()
+
+    async def test_close_disconnects_and_resets(self):
+        pool = RedisPool()
+        pool.open()
+        disconnect = AsyncMock()
+        pool.pool.disconnect = disconnect
+        await pool.close()
+        disconnect.assert_awaited_once()
+        self.assertIsNone(pool.client)
+        await pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
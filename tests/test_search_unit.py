@@ -0,0 +1,70 @@
+import unittest
+
+from sqlalchemy import text
+
+from src.database.models import Contact, User
+from src.search import _sqlite_candidates, like_escape, search_contacts, search_terms, trigrams, score_contact
+from sqlite_case import SQLiteTestCase
+
+
+class TestSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.contact = Contact(firstname="Michael", lastname="Smith", email="mike@corp.io", phone="+380501112233")
+
+    def test_search_terms(self):
+        self.assertEqual(search_terms("  Mike  SMITH "), ["mike", "smith"])
+        self.assertEqual(search_terms("mike@corp.io"), ["mike@corp.io"])
+
+    def test_trigrams_cover_transposition(self):
+        self.assertIn("ael", trigrams("mihcael"))
+        self.assertIn("joh", trigrams("jonh"))
+        self.assertEqual(trigrams("ab"), set())
+
+    def test_score_order(self):
+        exact = score_contact(self.contact, ["smith"])
+        prefix = score_contact(self.contact, ["smi"])
+        substring = score_contact(self.contact, ["mit"])
+        typo = score_contact(self.contact, ["smiht"])
+        self.assertEqual(exact, 1.0)
+        self.assertGreater(exact, prefix)
+        self.assertGreater(prefix, substring)
+        self.assertGreater(substring, typo)
+        self.assertGreater(typo, 0.5)
+
+    def test_score_all_terms(self):
+        self.assertGreater(score_contact(self.contact, ["mich", "smith"]), score_contact(self.contact, ["mich", "jones"]))
+
+    def test_score_unrelated(self):
+        self.assertLess(score_contact(self.contact, ["zzzz"]), 0.5)
+
+    def test_like_escape(self):
+        self.assertEqual(like_escape("a_b%c\\"), "a\\_b\\%c\\\\")
+
+
+class TestSearchCandidates(SQLiteTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.db.add_all([User(id=1, email="one@b.c", password="x"), User(id=2, email="two@b.c", password="x")])
+        self.db.add_all([Contact(id=1, user_id=1, firstname="a_x"), Contact(id=2, user_id=1, firstname="abx")])
+        await self.db.commit()
+
+    async def test_underscore_is_literal(self):
+        candidates = (await self.db.execute(_sqlite_candidates(1, ["a_"], 10))).scalars().all()
+        self.assertEqual([contact.id for contact in candidates], [1])
+        self.assertEqual([contact.id for contact in await search_contacts(1, "a_", self.db)], [1])
+
+    async def test_fts_results_stay_with_the_owner(self):
+        self.db.add(Contact(id=3, user_id=1, firstname="Michael", lastname="Smith"))
+        await self.db.commit()
+        # an index entry left with the old owner must not leak the contact
+        await self.db.execute(text("DROP TRIGGER contacts_fts_au"))
+        await self.db.execute(text("UPDATE contacts SET user_id = 2 WHERE id = 3"))
+        await self.db.commit()
+        candidates = (await self.db.execute(_sqlite_candidates(1, ["smith"], 10))).scalars().all()
+        self.assertEqual(candidates, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
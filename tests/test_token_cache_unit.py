@@ -0,0 +1,39 @@
+import time
+import unittest
+
+from src.token_cache import TokenCache
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TokenCache(size=2)
+
+    def test_get_returns_claims_until_exp(self):
+        claims = {"sub": "post@emeta.ua", "scope": "access_token", "exp": time.time() + 60}
+        self.cache.set("token", claims)
+        self.assertEqual(self.cache.get("token"), claims)
+        self.assertIsNone(self.cache.get("other"))
+
+    def test_expired_token_is_dropped(self):
+        self.cache.set("token", {"sub": "post@emeta.ua", "exp": time.time() - 1})
+        self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(len(self.cache._claims), 0)
+
+    def test_token_without_exp_is_not_cached(self):
+        self.cache.set("token", {"sub": "post@emeta.ua"})
+        self.assertIsNone(self.cache.get("token"))
+
+    def test_evicts_least_recently_used(self):
+        exp = time.time() + 60
+        self.cache.set("a", {"exp": exp})
+        self.cache.set("b", {"exp": exp})
+        self.cache.get("a")
+        self.cache.set("c", {"exp": exp})
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import unittest
+from unittest.mock import AsyncMock
+
+from redis.exceptions import ConnectionError
+
+from src.user_cache import AuthPrincipal, UserCache
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.cache = UserCache(self.redis, ttl=60, local_ttl=60, local_size=2)
+        self.user = AuthPrincipal(id=1, email="post@emeta.ua", avatar="url", confirmed=True)
+
+    async def test_set_skips_secrets(self):
+        await self.cache.set(self.user)
+        key, raw = self.redis.set.call_args.args
+        self.assertEqual(key, "user:post@emeta.ua")
+        self.assertNotIn("password", json.loads(raw))
+        self.assertEqual(self.redis.set.call_args.kwargs, {"ex": 60})
+
+    async def test_get_local_hit_skips_redis(self):
+        await self.cache.set(self.user)
+        result = await self.cache.get("post@emeta.ua")
+        self.assertEqual(result.id, 1)
+        self.assertEqual(result.avatar, "url")
+        self.redis.get.assert_not_called()
+
+    async def test_get_redis_hit(self):
+        self.redis.get.return_value = json.dumps({"id": 2, "email": "a@b.c", "avatar": None, "confirmed": False})
+        result = await self.cache.get("a@b.c")
+        self.assertEqual(result.id, 2)
+        self.redis.get.assert_awaited_once_with("user:a@b.c")
+
+    async def test_get_miss(self):
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get("a@b.c"))
+
+    async def test_redis_down_is_a_miss(self):
+        self.redis.get.side_effect = ConnectionError()
+        self.assertIsNone(await self.cache.get("a@b.c"))
+
+    async def test_local_tier_is_bounded(self):
+        for i in range(3):
+            await self.cache.set(AuthPrincipal(id=i, email=f"{i}@b.c", avatar=None, confirmed=False))
+        self.assertEqual(list(self.cache._local), ["1@b.c", "2@b.c"])
+
+    async def test_invalidate(self):
+        await self.cache.set(self.user)
+        await self.cache.invalidate("post@emeta.ua")
+        self.redis.delete.assert_awaited_once_with("user:post@emeta.ua")
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get("post@emeta.ua"))
+
+
+if __name__ == '__main__':
+    unittest.main()
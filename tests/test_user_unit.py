@@ -3,7 +3,7 @@ from unittest.mock import MagicMock, patch
 from fastapi.testclient import TestClient
 from main import app
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from libgravatar import Gravatar
 
 from src.database.models import User
@@ -19,7 +19,8 @@ client = TestClient(app)
 
 class TestRepositoryUsers(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.session.execute.return_value = MagicMock()
         self.body = UserModel(
             email="post@emeta.ua",
             password="simple123",
@@ -27,6 +28,7 @@ class TestRepositoryUsers(unittest.IsolatedAsyncioTestCase):
 
     async def test_confirmed_email(self):
         user = User(id=1)
+        self.session.execute.return_value.scalar.return_value = user
         email_=user.email
         result = await confirmed_email(email_, self.session)
         self.assertIsNone(result)